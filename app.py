@@ -1,132 +1,34 @@
-from flask import Flask, request, send_file, render_template
-from openpyxl import Workbook
-from openpyxl.worksheet.worksheet import Worksheet
-from typing import cast, Any
+import json
+import time
+import uuid
+import threading
+from flask import Flask, request, send_file, render_template, jsonify, Response, stream_with_context
+from typing import Any
 from io import BytesIO
 
-# Import report generator modules
-import broken_link
-import header
-import footer
-import image_link
-import metadata_link
-import pdf_link
-import find_text
-import find_text_pdf
-import asset_404
+import report_cache
+import result_store
+import run_context
+# Report generation lives outside Flask so cli.py can run it headless
+from report_runner import build_workbook, generate_reports, request_cache_key, request_key
 
 app = Flask(__name__)
 
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
-def _safe_append_row(ws: Worksheet, row: Any, headers: list[str] | None = None) -> None:
-    """
-    Append a row to an openpyxl worksheet safely.
-
-    Supports:
-    - dict: values pulled in header order
-    - list/tuple: appended as-is (optionally padded/trimmed to headers length)
-    - scalar: written into a single cell
-
-    This prevents crashes when a report returns list-of-lists.
-    """
-    if isinstance(row, dict):
-        if not headers:
-            for k, v in row.items():
-                ws.append([k, v])
-            return
-        ws.append([row.get(h, "") for h in headers])
-        return
-
-    if isinstance(row, (list, tuple)):
-        vals = list(row)
-        if headers:
-            if len(vals) < len(headers):
-                vals += [""] * (len(headers) - len(vals))
-            elif len(vals) > len(headers):
-                vals = vals[: len(headers)]
-        ws.append(vals)
-        return
-
-    ws.append([row])
-
-
-def generate_reports(selected_reports: list[str], form: dict[str, str]):
-    """
-    Run selected report generators and return structured output.
+# Runs by run id: background runs started via /runs/start and form posts.
+# Entries: ctx, xlsx (bytes once done), key (report_runner.request_key or
+# None), result_id (run id the XLSX is stored under in result_store, "" if
+# not stored), done (threading.Event), clients (ids of the requests sharing
+# the run; it is only cancelled once all have left)
+_active_runs: dict[str, dict[str, Any]] = {}
+_active_runs_lock = threading.Lock()
 
-    Each item:
-      (report_type, summary, details, headers)
+# Finished runs (and their XLSX) are kept this long for download
+RUN_RETENTION_SECONDS = 3600
 
-    details can be:
-      list[dict] OR list[list] OR list[str]
-    """
-    report_data = []
-
-    find_text_url = (form.get("find_text_url") or form.get("find_text_url_keyword") or "").strip()
-    find_text_pdf_keyword = (form.get("find_text_pdf") or form.get("find_text_pdf_keyword") or "").strip()
-
-    # Asset 404 input name flexibility
-    asset_404_urls = (
-        form.get("asset_404_urls")
-        or form.get("asset_urls")
-        or form.get("asset_404")
-        or form.get("urls")
-        or ""
-    ).strip()
-
-    if "broken-link" in selected_reports:
-        summary, details = broken_link.generate_broken_link_report()
-        headers = ["Page URL", "Broken Link", "Error"]
-        report_data.append(("Broken Link", summary, details, headers))
-
-    if "header" in selected_reports:
-        summary, details = header.generate_header_nav_report()
-        headers = ["Country", "Page URL", "Link Text", "Link URL", "Status Code", "Error"]
-        report_data.append(("Header Navigation", summary, details, headers))
-
-    if "footer" in selected_reports:
-        summary, details = footer.generate_footer_nav_report()
-        headers = ["Country", "Page URL", "Link Text", "Link URL", "Status Code", "Error"]
-        report_data.append(("Footer Navigation", summary, details, headers))
-
-    if "image" in selected_reports:
-        summary, details = image_link.generate_image_link_report()
-        headers = ["Page URL", "Broken Image URL", "Error"]
-        report_data.append(("Image Links", summary, details, headers))
-
-    if "metadata" in selected_reports:
-        summary, details = metadata_link.generate_metadata_report()
-        headers = [
-            "URL", "Title Tag", "Meta Description", "Meta Keywords",
-            "Title Tag Character Count", "Meta Description Character Count", "Meta Keywords Character Count"
-        ]
-        report_data.append(("Metadata", summary, details, headers))
-
-    if "pdf" in selected_reports:
-        summary, details = pdf_link.generate_pdf_link_report()
-        headers = ["Page URL", "Broken PDF URL", "Error"]
-        report_data.append(("PDF Links", summary, details, headers))
-
-    if "find-text-url" in selected_reports and find_text_url:
-        summary, details = find_text.find_text_in_url(find_text_url)
-        headers = ["URL"]
-        report_data.append(("Find Text in URL", summary, details, headers))
-
-    if "find-text-pdf" in selected_reports and find_text_pdf_keyword:
-        summary, details = find_text_pdf.find_text_in_pdf(find_text_pdf_keyword)
-        headers = ["PDF File", "Found Text"]
-        report_data.append(("Find Text in PDF", summary, details, headers))
-
-    if "asset-404" in selected_reports:
-        if not asset_404_urls:
-            summary, details = "No URLs provided for Asset 404 check.", []
-        else:
-            summary, details = asset_404.generate_asset_404_report(asset_404_urls)
-
-        headers = ["Input Page", "Asset Type", "Asset URL", "Status Code", "Error"]
-        report_data.append(("Asset 404", summary, details, headers))
-
-    return report_data
+# Cancel a streamed run if no client has been listening for this long
+ABANDON_GRACE_SECONDS = 30
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -138,41 +40,317 @@ def index():
 
         form_data = {k: v for k, v in request.form.items()}
 
-        output = BytesIO()
-        wb = Workbook()
-        ws = cast(Worksheet, wb.active)
-        ws.title = "Report Summary"
-        ws.append(["Report Type", "Details"])
-
+        _prune_runs()
+        entry, is_new = _claim_run(selected_reports, form_data)
+        ctx = entry["ctx"]
+        client_id = _join_run(entry)
+        # Keep the (possibly shared) run alive while this request waits on it
+        ctx.attach()
         try:
-            report_data = generate_reports(selected_reports, form_data)
+            if is_new:
+                _run_in_background(entry, selected_reports, form_data)
+            else:
+                entry["done"].wait()
+        finally:
+            ctx.detach()
+            _leave_run(entry, client_id)
+
+        if not entry["xlsx"]:
+            return ctx.message or "Internal Server Error: run did not finish.", 500
+
+        response = send_file(
+            BytesIO(entry["xlsx"]),
+            as_attachment=True,
+            download_name="site_health_report.xlsx",
+            mimetype=XLSX_MIMETYPE,
+        )
+        if entry["result_id"]:
+            response.headers["X-Run-Id"] = entry["result_id"]
+        return response
 
-            for report_type, summary, details, headers in report_data:
-                ws.append([report_type, summary])
+    return render_template("index.html")
 
-                if details:
-                    ws.append(["", ""])  # spacer
-                    ws.append(headers)
 
-                    for row in details:
-                        _safe_append_row(ws, row, headers=headers)
+def _save_run(report_data, run_id=None) -> str:
+    """Persist detail rows for history/diffs; never fail the download over it."""
+    if not result_store.is_enabled():
+        return ""
+    try:
+        return result_store.save_run(report_data, run_id=run_id)
+    except Exception as e:
+        app.logger.warning("Could not save run to result store: %s", e)
+        return ""
 
-                    ws.append(["", ""])  # spacer
 
-        except Exception as e:
-            return f"Internal Server Error: {e}", 500
+def _prune_runs() -> None:
+    cutoff = time.time() - RUN_RETENTION_SECONDS
+    with _active_runs_lock:
+        for run_id in [k for k, v in _active_runs.items() if v["ctx"].status != "running" and v["ctx"].created < cutoff]:
+            del _active_runs[run_id]
 
-        wb.save(output)
-        output.seek(0)
 
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name="site_health_report.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+def _claim_run(selected_reports: list[str], form: dict[str, str]):
+    """
+    Find or register the run serving this request. Returns (entry, is_new).
+
+    A request arriving while an identical one (same reports and inputs) is in
+    flight joins that run instead of starting another crawl. is_new means the
+    caller must run it; the run itself looks for a cached XLSX first (see
+    _run_in_background), since that needs the sitemaps and must not block
+    the web request.
+    """
+    key = request_key(selected_reports, form)
+
+    with _active_runs_lock:
+        if key:
+            for entry in _active_runs.values():
+                if entry["key"] == key and entry["ctx"].status == "running" and not entry["ctx"].cancelled:
+                    return entry, False
+
+        ctx = run_context.RunContext(
+            run_id=result_store.new_run_id(),
+            reports_total=len(selected_reports),
+            time_budget=run_context.get_time_budget(form.get("time_budget")),
         )
+        entry = {"ctx": ctx, "xlsx": None, "key": key, "result_id": "", "done": threading.Event(), "clients": set()}
+        _active_runs[ctx.run_id] = entry
+        return entry, True
 
-    return render_template("index.html")
+
+def _join_run(entry: dict[str, Any]) -> str:
+    """Register a client of a (possibly shared) run. Returns its client id."""
+    client_id = uuid.uuid4().hex
+    with _active_runs_lock:
+        entry["clients"].add(client_id)
+    return client_id
+
+
+def _leave_run(entry: dict[str, Any], client_id: str | None = None) -> int:
+    """
+    Unregister a client; without a client id, the only client (if there is
+    just one). Returns the number of clients still sharing the run, or -1 if
+    client_id was not given and several clients share the run.
+    """
+    with _active_runs_lock:
+        clients = entry["clients"]
+        if client_id:
+            clients.discard(client_id)
+        elif len(clients) > 1:
+            return -1
+        else:
+            clients.clear()
+        return len(clients)
+
+
+def _run_in_background(entry: dict[str, Any], selected_reports: list[str], form: dict[str, str]) -> None:
+    """
+    Run a claimed request. A finished XLSX for the same reports, inputs and
+    sitemap fingerprint within REPORT_CACHE_TTL is served as-is.
+    """
+    ctx = entry["ctx"]
+    try:
+        with run_context.use(ctx):
+            try:
+                cache_key = request_cache_key(selected_reports, form)
+                cached = report_cache.get(cache_key) if cache_key else None
+                if cached is not None:
+                    xlsx, run_id, saved = cached
+                    with _active_runs_lock:
+                        entry["xlsx"] = xlsx
+                        entry["result_id"] = run_id if saved else ""
+                    ctx.finish("done", "Report ready (cached).")
+                    return
+                report_data = generate_reports(selected_reports, form)
+                output = build_workbook(report_data)
+            except run_context.RunCancelled:
+                ctx.finish("cancelled", "Run cancelled; crawling stopped.")
+                return
+            except Exception as e:
+                ctx.finish("failed", f"Internal Server Error: {e}")
+                return
+
+        saved = bool(_save_run(report_data, run_id=ctx.run_id))
+        xlsx = output.getvalue()
+        with _active_runs_lock:
+            entry["xlsx"] = xlsx
+            entry["result_id"] = ctx.run_id if saved else ""
+        if cache_key:
+            report_cache.put(cache_key, (xlsx, ctx.run_id, saved))
+        ctx.finish("done", "Report ready.")
+    finally:
+        entry["done"].set()
+
+
+def _cancel_if_abandoned(ctx: run_context.RunContext) -> None:
+    if ctx.listeners == 0 and ctx.status == "running":
+        ctx.cancel()
+
+
+@app.post("/runs/start")
+def runs_start():
+    """Start a report run in the background; progress at /runs/<id>/events."""
+    selected_reports = request.form.getlist("report")
+    if not selected_reports:
+        return "Please select at least one report.", 400
+
+    _prune_runs()
+    form_data = {k: v for k, v in request.form.items()}
+    entry, is_new = _claim_run(selected_reports, form_data)
+    client_id = _join_run(entry)
+    if is_new:
+        threading.Thread(
+            target=_run_in_background, args=(entry, selected_reports, form_data), daemon=True
+        ).start()
+    # Joined runs report the shared run id; its events end immediately if already done.
+    # client_id identifies this client to /runs/<id>/cancel
+    return {"run_id": entry["ctx"].run_id, "client_id": client_id, "shared": not is_new}, 202
+
+
+def _get_active_run(run_id: str):
+    with _active_runs_lock:
+        return _active_runs.get(run_id)
+
+
+@app.get("/runs/<run_id>/events")
+def runs_events(run_id: str):
+    """
+    Server-sent events with live progress, one JSON "progress" event per second
+    and a final "end" event. If every listener disconnects, the run is
+    cancelled after ABANDON_GRACE_SECONDS.
+    """
+    entry = _get_active_run(run_id)
+    if not entry:
+        return {"error": "Unknown run id."}, 404
+    ctx = entry["ctx"]
+
+    def stream():
+        ctx.attach()
+        try:
+            while True:
+                snap = ctx.snapshot()
+                event = "progress" if snap["status"] == "running" else "end"
+                yield f"event: {event}\ndata: {json.dumps(snap)}\n\n"
+                if event == "end":
+                    return
+                time.sleep(1)
+        finally:
+            if ctx.detach() == 0 and ctx.status == "running":
+                timer = threading.Timer(ABANDON_GRACE_SECONDS, _cancel_if_abandoned, args=(ctx,))
+                timer.daemon = True
+                timer.start()
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/runs/<run_id>/cancel")
+def runs_cancel(run_id: str):
+    """
+    Leave a run (?client=<client_id> from /runs/start). The run is only
+    cancelled once no client shares it; other clients keep waiting for it.
+    Without a client id, a run shared by several clients is not cancelled (409).
+    """
+    entry = _get_active_run(run_id)
+    if not entry:
+        return {"error": "Unknown run id."}, 404
+    remaining = _leave_run(entry, request.args.get("client"))
+    if remaining < 0:
+        return {"error": "Run is shared by several clients; cancel with ?client=<client_id>."}, 409
+    if remaining > 0:
+        return {"run_id": run_id, "status": "detached", "clients": remaining}, 202
+    entry["ctx"].cancel()
+    return {"run_id": run_id, "status": "cancelling"}, 202
+
+
+@app.get("/runs/<run_id>/download")
+def runs_download(run_id: str):
+    entry = _get_active_run(run_id)
+    if not entry:
+        return {"error": "Unknown run id."}, 404
+    if not entry["xlsx"]:
+        return {"error": "Report is not ready.", "status": entry["ctx"].status}, 409
+
+    response = send_file(
+        BytesIO(entry["xlsx"]),
+        as_attachment=True,
+        download_name="site_health_report.xlsx",
+        mimetype=XLSX_MIMETYPE,
+    )
+    response.headers["X-Run-Id"] = entry["result_id"] or run_id
+    return response
+
+
+@app.get("/runs")
+def runs_list():
+    """JSON list of stored runs (most recent first)."""
+    if not result_store.is_enabled():
+        return {"error": "Result store is disabled (RESULT_STORE_PATH is empty)."}, 404
+    try:
+        limit = int(request.args.get("limit", "50"))
+    except ValueError:
+        limit = 50
+    return jsonify(result_store.list_runs(limit=limit))
+
+
+@app.get("/runs/diff")
+def runs_diff():
+    """
+    JSON diff between two runs.
+
+    Query params:
+      head   - run id to inspect (required)
+      base   - run id to compare against (default: previous run of each report)
+      report - limit to one report type, e.g. "Image Links"
+    """
+    if not result_store.is_enabled():
+        return {"error": "Result store is disabled (RESULT_STORE_PATH is empty)."}, 404
+    head = request.args.get("head", "").strip()
+    if not head:
+        return {"error": "Missing 'head' run id."}, 400
+    diffs = result_store.diff_runs(
+        head,
+        base_run_id=request.args.get("base", "").strip() or None,
+        report_type=request.args.get("report", "").strip() or None,
+    )
+    return jsonify(diffs)
+
+
+@app.get("/runs/persistent")
+def runs_persistent():
+    """JSON rows of a report that have been present in every run for at least N days."""
+    if not result_store.is_enabled():
+        return {"error": "Result store is disabled (RESULT_STORE_PATH is empty)."}, 404
+    report_type = request.args.get("report", "").strip()
+    if not report_type:
+        return {"error": "Missing 'report' (e.g. 'Image Links')."}, 400
+    try:
+        days = float(request.args.get("days", "7"))
+    except ValueError:
+        days = 7
+    headers, rows = result_store.persistent_rows(report_type, days)
+    return jsonify({"report_type": report_type, "days": days, "headers": headers, "rows": rows})
+
+
+@app.get("/history")
+def history():
+    """UI view of stored runs, with an optional diff between two of them."""
+    if not result_store.is_enabled():
+        return "Result store is disabled (RESULT_STORE_PATH is empty).", 404
+
+    head = request.args.get("head", "").strip()
+    base = request.args.get("base", "").strip()
+    diffs = result_store.diff_runs(head, base_run_id=base or None) if head else []
+
+    return render_template(
+        "history.html",
+        runs=result_store.list_runs(),
+        head=head,
+        base=base,
+        diffs=diffs,
+    )
 
 
 @app.get("/health")
@@ -1,14 +1,24 @@
 # asset_404.py
 import certifi
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 
-from http_client import get_session
+import page_cache
+import run_context
+import url_canon
+import url_rules
+from http_client import fetch
+from link_checker import check_url_status
+from report_schema import Asset404Row
 
 MAX_INPUT_URLS = 20  # ✅ Only 20 URLs allowed at a time (comma-separated or newline-separated)
 
 
-def _normalize_input_urls(raw: str):
+def _add_asset(assets, url, base):
+    """Keep the first URL linked for each canonical form; that URL is what gets requested."""
+    assets.setdefault(url_canon.canonicalize(url, base=base), url_canon.resolve(url, base=base))
+
+
+def normalize_input_urls(raw: str):
     """Accept URLs separated by newlines OR commas. Adds https:// if missing."""
     if not raw:
         return []
@@ -24,12 +34,13 @@ def _normalize_input_urls(raw: str):
             u = "https://" + u
         urls.append(u)
 
-    # De-duplicate while preserving order
+    # De-duplicate (on the canonical form) while preserving order
     seen = set()
     deduped = []
     for u in urls:
-        if u not in seen:
-            seen.add(u)
+        key = url_canon.canonicalize(u)
+        if key not in seen:
+            seen.add(key)
             deduped.append(u)
     return deduped
 
@@ -61,44 +72,6 @@ def _is_image(url: str):
     return any(url_l.endswith(ext) for ext in [".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".avif"])
 
 
-def _check_url_status(session, url: str, headers, timeout=15):
-    """
-    HEAD first for speed; fallback to GET for 403/405 or HEAD failures.
-    Returns (status_code:int|None, error:str)
-    """
-    try:
-        r = session.head(
-            url,
-            headers=headers,
-            allow_redirects=True,
-            verify=certifi.where(),
-            timeout=timeout,
-        )
-        status = r.status_code
-        if status in (403, 405):
-            r = session.get(
-                url,
-                headers=headers,
-                allow_redirects=True,
-                verify=certifi.where(),
-                timeout=timeout,
-            )
-            status = r.status_code
-        return status, ""
-    except Exception:
-        try:
-            r = session.get(
-                url,
-                headers=headers,
-                allow_redirects=True,
-                verify=certifi.where(),
-                timeout=timeout,
-            )
-            return r.status_code, ""
-        except Exception as e2:
-            return None, str(e2)
-
-
 def generate_asset_404_report(raw_urls: str):
     """
     User provides up to 20 URLs. For each page:
@@ -106,7 +79,7 @@ def generate_asset_404_report(raw_urls: str):
     - check each extracted asset
     - return ONLY assets that respond with HTTP 404
     """
-    session = get_session()
+    session = run_context.current().session()
 
     headers = {
         "User-Agent": (
@@ -115,23 +88,34 @@ def generate_asset_404_report(raw_urls: str):
         )
     }
 
-    page_urls = _normalize_input_urls(raw_urls)
+    page_urls = normalize_input_urls(raw_urls)
     if not page_urls:
         return "No URLs provided for Asset 404 check.", []
 
     if len(page_urls) > MAX_INPUT_URLS:
         return f"Please provide up to {MAX_INPUT_URLS} URLs only (you entered {len(page_urls)}).", []
 
+    page_urls = url_rules.get_rules("asset-404", "pages").filter(page_urls)
+    link_rules = url_rules.get_rules("asset-404", "links")
+
+    progress = run_context.current()
+    progress.add_pages(len(page_urls))
+
     broken_404 = []
     pages_checked = 0
     assets_checked = 0
+    parse_stats = page_cache.ParseStats()
 
     for page_url in page_urls:
+        if progress.out_of_time():
+            break
+        progress.begin_page()
         pages_checked += 1
 
         # Fetch the page HTML
         try:
-            resp = session.get(
+            resp = fetch(
+                session,
                 page_url,
                 headers=headers,
                 allow_redirects=True,
@@ -139,69 +123,70 @@ def generate_asset_404_report(raw_urls: str):
                 timeout=20,
             )
             resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
+            page = page_cache.parse_response(resp, parse_stats)
         except Exception as e:
+            progress.error()
             broken_404.append(
-                {
-                    "Input Page": page_url,
-                    "Asset Type": "PAGE",
-                    "Asset URL": page_url,
-                    "Status Code": getattr(getattr(e, "response", None), "status_code", ""),
-                    "Error": f"Failed to fetch page: {e}",
-                }
+                Asset404Row(
+                    page_url,
+                    "PAGE",
+                    page_url,
+                    getattr(getattr(e, "response", None), "status_code", ""),
+                    f"Failed to fetch page: {e}",
+                )
             )
             continue
 
-        assets = set()
+        assets = {}  # canonical form -> URL as linked (first seen)
+        # Links are relative to the page as served (after redirects)
+        base = resp.url or page_url
 
         # --- Links (<a href>) ---
-        for a in soup.find_all("a", href=True):
-            href = (a.get("href") or "").strip()
+        for href, _ in page.anchors:
             if not href:
                 continue
-            if href.startswith("#") or href.lower().startswith(("javascript:", "mailto:", "tel:")):
+            if href.startswith("#"):
                 continue
-            assets.add(urljoin(page_url, href))
+            _add_asset(assets, href, base)
 
         # --- Images (<img src/data-src>) + srcset ---
-        for img in soup.find_all("img"):
-            src = (img.get("src") or img.get("data-src") or "").strip()
+        for src, data_src, srcset, data_srcset in page.images:
+            src = src or data_src
             if src:
-                assets.add(urljoin(page_url, src))
-            srcset = (img.get("srcset") or img.get("data-srcset") or "").strip()
-            for u in _extract_srcset_urls(srcset):
-                assets.add(urljoin(page_url, u))
+                _add_asset(assets, src, base)
+            for u in _extract_srcset_urls(srcset or data_srcset):
+                _add_asset(assets, u, base)
 
         # <source srcset> (for responsive images/videos)
-        for source in soup.find_all("source"):
-            srcset = (source.get("srcset") or "").strip()
+        for srcset in page.source_srcsets:
             for u in _extract_srcset_urls(srcset):
-                assets.add(urljoin(page_url, u))
+                _add_asset(assets, u, base)
+
+        # Drop excluded URL families (javascript:/mailto:/tel:/data: by default) before any request
+        assets = [u for u in assets.values() if link_rules.allows(u)]
 
         # Check each asset; store ONLY 404 rows
         for asset_url in sorted(assets):
             assets_checked += 1
-            status, err = _check_url_status(session, asset_url, headers=headers)
+            progress.asset_checked()
+            status, err = check_url_status(session, asset_url, headers=headers)
+
+            if _is_pdf(asset_url):
+                asset_type = "PDF"
+            elif _is_image(asset_url):
+                asset_type = "Image"
+            else:
+                asset_type = "Link"
+            if asset_type != "Link":
+                progress.record_asset(page_url, asset_url, asset_type)
+
             if status == 404:
-                if _is_pdf(asset_url):
-                    asset_type = "PDF"
-                elif _is_image(asset_url):
-                    asset_type = "Image"
-                else:
-                    asset_type = "Link"
-
-                broken_404.append(
-                    {
-                        "Input Page": page_url,
-                        "Asset Type": asset_type,
-                        "Asset URL": asset_url,
-                        "Status Code": status,
-                        "Error": err,
-                    }
-                )
+                progress.error()
+                broken_404.append(Asset404Row(page_url, asset_type, asset_url, status, err))
 
     summary = (
         f"Asset 404 check completed. Pages checked: {pages_checked}. "
-        f"Assets checked: {assets_checked}. 404 assets found: {len(broken_404)}."
+        f"Assets checked: {assets_checked}. 404 assets found: {len(broken_404)}. "
+        f"{parse_stats.summary()} {progress.coverage_note()}"
     )
     return summary, broken_404
\ No newline at end of file
@@ -0,0 +1,216 @@
+# asset_validation.py
+import os
+import struct
+import certifi
+import threading
+from collections import OrderedDict
+
+import env_config
+import run_context
+import url_canon
+from http_client import split_timeout
+from link_checker import check_url
+
+# ASSET_VALIDATION=1 turns on content checks for images and PDFs that
+# answered 200: only the first ASSET_VALIDATION_BYTES are fetched (Range
+# request) and checked, so a soft-404 HTML page served as .pdf is caught
+# without downloading whole files
+DEFAULT_VALIDATION_BYTES = 8192
+
+# Results for URLs with an ETag are kept across runs, keyed by (URL, ETag)
+DEFAULT_CACHE_ENTRIES = 20000
+
+PDF_CONTENT_TYPES = ("application/pdf", "application/x-pdf", "application/octet-stream", "binary/octet-stream")
+
+# Sniffed format -> Content-Types that match it
+IMAGE_CONTENT_TYPES = {
+    "PNG": ("image/png", "image/apng"),
+    "JPEG": ("image/jpeg", "image/jpg", "image/pjpeg"),
+    "GIF": ("image/gif",),
+    "WEBP": ("image/webp",),
+    "AVIF": ("image/avif",),
+    "SVG": ("image/svg+xml",),
+    "BMP": ("image/bmp", "image/x-ms-bmp"),
+    "ICO": ("image/x-icon", "image/vnd.microsoft.icon"),
+}
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # (url, etag) -> problem ("" = valid)
+
+
+def is_enabled():
+    return os.getenv("ASSET_VALIDATION", "0") == "1"
+
+
+def sniff(data):
+    """Format of a body from its first bytes: "PDF", "PNG", "JPEG", ..., "HTML", or "" if unknown."""
+    if b"%PDF-" in data[:1024]:
+        return "PDF"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return "AVIF"
+    if data.startswith(b"BM"):
+        return "BMP"
+    if data.startswith(b"\x00\x00\x01\x00"):
+        return "ICO"
+
+    head = data[:1024].lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if head.startswith((b"<!doctype html", b"<html")) or b"<body" in head:
+        return "HTML"
+    if b"<svg" in head:
+        return "SVG"
+    return ""
+
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None
+
+
+def image_size(kind, data):
+    """(width, height) read from the image header, or None if not in these bytes / not a raster format."""
+    try:
+        if kind == "PNG" and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])
+        if kind == "GIF":
+            return struct.unpack("<HH", data[6:10])
+        if kind == "BMP":
+            width, height = struct.unpack("<ii", data[18:26])
+            return width, abs(height)
+        if kind == "JPEG":
+            return _jpeg_size(data)
+        if kind == "WEBP":
+            return _webp_size(data)
+    except struct.error:
+        return None
+    return None
+
+
+def _problem(expected, content_type, data):
+    """What is wrong with a body that should be an `expected` ("Image" or "PDF"), or ""."""
+    if not data:
+        return "Empty body"
+    kind = sniff(data)
+    looks_like = kind or "unrecognised data"
+    served_as = content_type or "no Content-Type"
+
+    if expected == "PDF":
+        if kind != "PDF":
+            return f"Not a PDF: body is {looks_like} ({served_as})"
+        if content_type and content_type not in PDF_CONTENT_TYPES:
+            return f"PDF served as {content_type}"
+        return ""
+
+    if kind not in IMAGE_CONTENT_TYPES:
+        return f"Not an image: body is {looks_like} ({served_as})"
+    if content_type and content_type not in IMAGE_CONTENT_TYPES[kind]:
+        return f"{kind} image served as {content_type}"
+    size = image_size(kind, data)
+    if size is not None and (size[0] <= 0 or size[1] <= 0):
+        return f"Invalid {kind} dimensions {size[0]}x{size[1]}"
+    return ""
+
+
+def _fetch_head(session, url, headers, timeout):
+    """First ASSET_VALIDATION_BYTES of url (servers that ignore Range are cut off there)."""
+    limit = max(env_config.get_int("ASSET_VALIDATION_BYTES", DEFAULT_VALIDATION_BYTES), 16)
+    range_headers = dict(headers or {})
+    range_headers["Range"] = f"bytes=0-{limit - 1}"
+    range_headers["Accept-Encoding"] = "identity"
+    with session.get(
+        url,
+        headers=range_headers,
+        verify=certifi.where(),
+        timeout=split_timeout(timeout),
+        stream=True,
+    ) as resp:
+        if resp.status_code == 416:
+            return resp, b""
+        return resp, resp.raw.read(limit, decode_content=True) or b""
+
+
+def validate_asset(session, url, expected, headers, timeout=20):
+    """
+    Check that url (which answered 2xx) really is an `expected` asset, "Image"
+    or "PDF": magic bytes, Content-Type consistency and, for raster images,
+    non-zero dimensions in the header. Returns a problem description, or ""
+    if the asset looks valid or could not be checked.
+
+    Each URL is validated once per run; when the status check saw an ETag,
+    the result is also kept across runs under (final URL, ETag).
+    """
+    ctx = run_context.current()
+    url_key = url_canon.canonicalize(url)
+    known = ctx.asset_validation.get(url_key)
+    if known is not None:
+        return known
+
+    result = check_url(session, url, headers, timeout)
+    if result.status is None or result.status >= 400:
+        return ""
+
+    target = result.final_url or url
+    key = (target, result.etag) if result.etag else None
+    if key:
+        with _lock:
+            problem = _cache.get(key)
+            if problem is not None:
+                _cache.move_to_end(key)
+                ctx.asset_validation[url_key] = problem
+                return problem
+
+    try:
+        resp, data = _fetch_head(session, target, headers, timeout)
+    except Exception:
+        # Network trouble is the status check's business; don't guess here
+        return ""
+    if resp.status_code >= 400 and resp.status_code != 416:
+        return ""
+
+    content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    problem = _problem(expected, content_type, data)
+
+    ctx.asset_validation[url_key] = problem
+    etag = resp.headers.get("ETag", "") or result.etag
+    if etag:
+        max_entries = env_config.get_int("ASSET_VALIDATION_CACHE_SIZE", DEFAULT_CACHE_ENTRIES)
+        with _lock:
+            _cache[(target, etag)] = problem
+            _cache.move_to_end((target, etag))
+            while len(_cache) > max(max_entries, 1):
+                _cache.popitem(last=False)
+    return problem
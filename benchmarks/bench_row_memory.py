@@ -0,0 +1,85 @@
+# benchmarks/bench_row_memory.py
+"""
+Memory and write time of report rows: the old per-row dicts keyed by
+column header versus the report_schema NamedTuple rows.
+
+For each row shape, builds N rows both ways, measures the memory they hold
+(tracemalloc, URL/text values shared so only the row containers differ)
+and the time to flatten them for the sheet with report_runner's
+_safe_append_row.
+
+Usage:
+    python benchmarks/bench_row_memory.py [--rows 100000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import report_schema  # noqa: E402
+from report_runner import _safe_append_row  # noqa: E402
+
+
+def sample_rows(n):
+    """n rows per shape, values drawn from small pools like a real crawl."""
+    pages = [f"https://www.example.com/products/family-{i}/item" for i in range(500)]
+    assets = [f"https://www.example.com/content/dam/images/img-{i}.jpg" for i in range(5000)]
+    return {
+        "BrokenImageRow (3 cols)": [
+            report_schema.BrokenImageRow(pages[i % 500], assets[i % 5000], 404) for i in range(n)
+        ],
+        "NavLinkRow (6 cols)": [
+            report_schema.NavLinkRow("US", pages[i % 500], "Products", assets[i % 5000], 200, "") for i in range(n)
+        ],
+        "Asset404Row (5 cols)": [
+            report_schema.Asset404Row(pages[i % 500], "Image", assets[i % 5000], 404, "") for i in range(n)
+        ],
+    }
+
+
+def as_dicts(rows):
+    columns = type(rows[0]).COLUMNS
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    rows = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, size
+
+
+def write_time(rows, headers):
+    out = []
+    start = time.perf_counter()
+    for row in rows:
+        _safe_append_row(out, row, headers=headers)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{args.rows:,} rows per shape")
+    print(f"{'row type':<26}{'dict MB':>9}{'tuple MB':>10}{'saved':>8}{'dict write s':>14}{'tuple write s':>15}")
+    for name, rows in sample_rows(args.rows).items():
+        headers = list(type(rows[0]).COLUMNS)
+        tuple_rows, tuple_bytes = measure(lambda: [r._make(r) for r in rows])
+        dict_rows, dict_bytes = measure(lambda: as_dicts(rows))
+        print(
+            f"{name:<26}{dict_bytes / 1e6:>9.1f}{tuple_bytes / 1e6:>10.1f}"
+            f"{1 - tuple_bytes / dict_bytes:>8.0%}"
+            f"{write_time(dict_rows, headers):>14.3f}{write_time(tuple_rows, headers):>15.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_visible_text.py
+"""
+Throughput of the Find Text in URL keyword test: the old BeautifulSoup
+get_text().lower() path versus the streaming visible_text scanner.
+
+Usage:
+    python benchmarks/bench_visible_text.py [saved_page.html ...] [--keyword WORD] [--repeat N]
+
+With no files, synthetic pages (large inline scripts/styles, long body) are used.
+Save real pages with e.g. `curl -o page.html https://www.micron.com/...`.
+"""
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import visible_text  # noqa: E402
+
+
+def synthetic_pages():
+    script = "<script>" + "var x = {a: 1, b: [1, 2, 3]};\n" * 4000 + "</script>"
+    style = "<style>" + ".c { color: #333; margin: 0 auto; }\n" * 2000 + "</style>"
+    body = "".join(f"<div class='row'><p>Paragraph {i} about memory and storage.</p></div>\n" for i in range(3000))
+    page = f"<html><head><title>T</title>{style}{script}</head><body>{body}</body></html>"
+    return [("synthetic-early", page.replace("Paragraph 10 ", "Paragraph 10 needle ")),
+            ("synthetic-late", page.replace("Paragraph 2990 ", "Paragraph 2990 needle ")),
+            ("synthetic-miss", page)]
+
+
+def old_path(html, keyword):
+    text = BeautifulSoup(html, "html.parser").get_text(separator=" ", strip=True)
+    return keyword.lower() in text.lower()
+
+
+def new_path(html, keyword):
+    chunks = (html[i:i + visible_text.CHUNK_SIZE] for i in range(0, len(html), visible_text.CHUNK_SIZE))
+    return visible_text.contains_in_chunks(chunks, keyword)
+
+
+def bench(fn, html, keyword, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = fn(html, keyword)
+    return (time.perf_counter() - start) / repeat, found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--keyword", default="needle")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append((os.path.basename(path), f.read()))
+    else:
+        pages = synthetic_pages()
+
+    print(f"{'page':<24}{'KB':>8}{'old MB/s':>11}{'new MB/s':>11}{'speedup':>9}  found(old/new)")
+    for name, html in pages:
+        mb = len(html.encode("utf-8")) / 1e6
+        old_s, old_found = bench(old_path, html, args.keyword, args.repeat)
+        new_s, new_found = bench(new_path, html, args.keyword, args.repeat)
+        print(
+            f"{name[:23]:<24}{mb * 1000:>8.0f}{mb / old_s:>11.1f}{mb / new_s:>11.1f}"
+            f"{old_s / new_s:>8.1f}x  {old_found}/{new_found}"
+        )
+
+
+if __name__ == "__main__":
+    main()
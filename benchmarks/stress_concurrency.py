@@ -0,0 +1,190 @@
+# benchmarks/stress_concurrency.py
+"""
+Concurrency stress test for the report generators, as run by threaded
+(or gevent) gunicorn workers: many report requests at once in one process.
+
+A local mock server serves SITES small sites (/s<k>/sitemap.xml, pages,
+images, PDFs) with LATENCY_MS per response; every site has its own broken
+assets and its own keyword. Each request crawls one site in its own
+RunContext, the way app.py runs a form post.
+
+1. Every request is run once on its own (baseline, also gives serial time).
+2. All requests are run again simultaneously, on one thread each.
+3. Isolation: each concurrent result must equal its baseline exactly, and
+   no row may mention another site's URLs.
+4. Throughput: serial time vs concurrent wall time.
+
+Usage:
+    python benchmarks/stress_concurrency.py [--requests 16] [--sites 8] [--pages 12] [--latency-ms 20]
+
+Exits 1 if any isolation check fails.
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+REPORTS = ["broken-link", "image", "pdf", "metadata", "find-text-url"]
+
+PNG = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + (64).to_bytes(4, "big") + (32).to_bytes(4, "big")
+    + b"\x08\x02\x00\x00\x00" + b"\x00" * 64
+)
+PDF = b"%PDF-1.4\n" + b"0" * 64
+
+
+def make_handler(pages, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b"", ctype="text/html"):
+            time.sleep(latency)
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_GET(self):
+            m = re.match(r"^/s(\d+)/(.*)$", self.path.split("?")[0])
+            if not m:
+                return self._send(404, b"not found")
+            site, rest = int(m.group(1)), m.group(2)
+            base = f"http://{self.headers['Host']}/s{site}"
+
+            if rest == "sitemap.xml":
+                locs = "".join(f"<url><loc>{base}/p/{i}</loc></url>" for i in range(pages))
+                locs += f"<url><loc>{base}/gone-{site}</loc></url>"
+                body = f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+                return self._send(200, body.encode(), "application/xml")
+            if rest.startswith("p/"):
+                i = int(rest[2:])
+                # Site k has k+1 broken images per page and a keyword of its own
+                images = "".join(f'<img src="/s{site}/img/missing-{j}.png">' for j in range(site + 1))
+                body = (
+                    f"<html><head><title>Site {site} page {i}</title>"
+                    f'<meta name="description" content="Site {site} description"></head>'
+                    f"<body><h1>Site {site}</h1><p>keyword-{site} appears here</p>"
+                    f'<img src="/s{site}/img/ok.png">{images}'
+                    f'<a href="/s{site}/docs/ok.pdf">pdf</a><a href="/s{site}/docs/missing-{i % 3}.pdf">bad</a>'
+                    f'<a href="/s{site}/p/{(i + 1) % pages}">next</a></body></html>'
+                )
+                return self._send(200, body.encode())
+            if rest == "img/ok.png":
+                return self._send(200, PNG, "image/png")
+            if rest == "docs/ok.pdf":
+                return self._send(200, PDF, "application/pdf")
+            return self._send(404, b"not found")
+
+        do_HEAD = do_GET
+
+    return Handler
+
+
+def start_server(pages, latency):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(pages, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_request(port, site):
+    """One report request for one site, in its own RunContext (as app.py does)."""
+    import run_context
+    from report_runner import generate_reports
+
+    form = {
+        "sites": f"http://127.0.0.1:{port}/s{site}/sitemap.xml",
+        "find_text_url": f"keyword-{site}",
+    }
+    ctx = run_context.RunContext(run_id=f"stress-{site}", reports_total=len(REPORTS))
+    with run_context.use(ctx):
+        report_data = generate_reports(REPORTS, form, use_cache=False)
+    return normalize(report_data)
+
+
+def normalize(report_data):
+    """Comparable form of a result: (report type, summary, sorted rows as tuples of str)."""
+    from report_runner import report_rows
+
+    return [
+        (report_type, summary, sorted(tuple(str(v) for v in row) for row in report_rows(details, headers)))
+        for report_type, summary, details, headers in report_data
+    ]
+
+
+def foreign_urls(result, port, site):
+    """URLs in a result that belong to another site."""
+    own = f"http://127.0.0.1:{port}/s{site}/"
+    found = set()
+    for _, summary, rows in result:
+        for text in [summary] + [v for row in rows for v in row]:
+            for url in re.findall(rf"http://127\.0\.0\.1:{port}/s\d+/[^\s'\"]*", text):
+                if not url.startswith(own):
+                    found.add(url)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=16, help="simultaneous report requests")
+    parser.add_argument("--sites", type=int, default=8, help="distinct mock sites (requests cycle over them)")
+    parser.add_argument("--pages", type=int, default=12, help="pages per site")
+    parser.add_argument("--latency-ms", type=float, default=20, help="mock server delay per response")
+    parser.add_argument("--per-host", type=int, default=64, help="HTTP_MAX_PER_HOST (all mock sites share one host)")
+    args = parser.parse_args()
+
+    # Read at import time by http_client; keep runs off the result store and local files
+    os.environ["HTTP_MAX_PER_HOST"] = str(args.per_host)
+    os.environ.setdefault("HTTP_MAX_CONNECTIONS", str(max(args.per_host, 16)))
+    os.environ["SAVE_LOCAL_EXCEL"] = "0"
+    os.environ["MAX_SITEMAP_PAGES"] = "0"
+
+    server = start_server(args.pages, args.latency_ms / 1000)
+    port = server.server_address[1]
+    sites = [i % args.sites for i in range(args.requests)]
+
+    print(f"{args.requests} requests over {args.sites} sites, {args.pages} pages each, "
+          f"{args.latency_ms:g} ms latency, reports: {', '.join(REPORTS)}")
+
+    start = time.perf_counter()
+    baseline = {}
+    for site in sorted(set(sites)):
+        baseline[site] = run_request(port, site)
+    per_site = (time.perf_counter() - start) / len(baseline)
+    serial = per_site * args.requests
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.requests) as pool:
+        results = list(pool.map(lambda s: run_request(port, s), sites))
+    concurrent = time.perf_counter() - start
+    server.shutdown()
+
+    failures = 0
+    for i, (site, result) in enumerate(zip(sites, results)):
+        if result != baseline[site]:
+            failures += 1
+            print(f"  request {i} (site {site}): result differs from its baseline")
+        leaked = foreign_urls(result, port, site)
+        if leaked:
+            failures += 1
+            print(f"  request {i} (site {site}): other sites' URLs in result, e.g. {sorted(leaked)[0]}")
+
+    print(f"serial (estimated from baseline): {serial:.2f}s   concurrent: {concurrent:.2f}s   "
+          f"speedup: {serial / concurrent:.1f}x")
+    print("isolation: OK" if not failures else f"isolation: {failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,88 +1,242 @@
+import math
+import hashlib
 import requests
 import pandas as pd
 import xml.etree.ElementTree as ET
 import certifi
+from urllib.parse import urlparse
+
+import env_config
+import page_cache
+import run_context
+import sitemap
+import url_canon
+import url_rules
+from http_client import read_body, split_timeout
+from link_checker import check_url_status
+from report_schema import BrokenLinkRow
+
+# Referring pages kept per URL (the rest are only counted)
+MAX_REFERRERS_PER_URL = 5
+
+
+class _BloomFilter:
+    """
+    Fixed-size visited set for the deep crawl: ~29 bits per URL at a 1e-6
+    false-positive rate, so memory stays bounded however many URLs a site has.
+    A false positive only means a URL is (very rarely) not re-queued.
+    """
+
+    def __init__(self, capacity, error_rate=1e-6):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def __contains__(self, item):
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(item))
+
+    def add(self, item):
+        """Add item; returns True if it was (probably) already present."""
+        present = True
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
 
 def generate_broken_link_report():
-    sitemap_url = "https://www.micron.com/sitemap.xml"
+    """
+    Check sitemap URLs and, with CRAWL_DEPTH > 0, crawl breadth-first into
+    in-domain links found on those pages.
+
+    - CRAWL_DEPTH: link levels to follow beyond the sitemap (default 0 = sitemap only)
+    - CRAWL_MAX_URLS: cap on URLs queued and checked in one run (default 50000)
+
+    Returns:
+        summary (str)
+        broken_links (list[BrokenLinkRow])  # referring pages, broken URL, error
+    """
+    session = run_context.current().session()
+    sitemap_url = sitemap.get_sitemap_url()
     headers = {"User-Agent": "Mozilla/5.0"}
 
+    # Sitemap URLs are cheap HEAD checks, so scan all unless MAX_SITEMAP_PAGES is set
+    max_pages = sitemap.get_max_pages(default=0)
+    max_depth = max(env_config.get_int("CRAWL_DEPTH", 0), 0)
+    max_urls = max(env_config.get_int("CRAWL_MAX_URLS", 50000), 1)
+
     # --- Fetch sitemap ---
     try:
-        response = requests.get(
-            sitemap_url,
-            headers=headers,
-            verify=certifi.where(),
-            timeout=20
-        )
-        response.raise_for_status()
-        root = ET.fromstring(response.text)
+        entries = sitemap.fetch_sitemap_entries(session, sitemap_url, headers, timeout=20)
     except requests.RequestException as e:
-        return f"Error fetching sitemap: {e}"
+        return f"Error fetching sitemap: {e}", []
     except ET.ParseError as e:
-        return f"Error parsing sitemap XML: {e}"
-
-    namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
+        return f"Error parsing sitemap XML: {e}", []
 
     # --- Extract URLs from sitemap ---
-    urls = []
-    for url_node in root.findall('ns:url', namespace):
-        loc_tag = url_node.find('ns:loc', namespace)
-        if loc_tag is not None and loc_tag.text:
-            urls.append(loc_tag.text.strip())
+    page_rules = url_rules.get_rules("broken-link", "pages")
+    link_rules = url_rules.get_rules("broken-link", "links")
+    entries = [e for e in entries if page_rules.allows(e.loc)]
+    urls, sample_info = sitemap.select_urls(entries, max_pages)
 
-    broken_links = []
+    # Links are followed only within the sitemap's own host(s)
+    site_hosts = {urlparse(u).hostname for u in urls}
+
+    progress = run_context.current()
+    progress.add_pages(len(urls))
+    parse_stats = page_cache.ParseStats()
+
+    # Every URL ever queued (checked or waiting) is in `visited`; at most
+    # max(max_urls, sitemap URLs) are queued, so the filter stays within capacity
+    visited = _BloomFilter(max(max_urls, len(urls)))
+    # canonical url -> ([referring pages], total count), for queued URLs until they
+    # are checked and for broken ones afterwards; URLs found OK are dropped
+    referrers = {}
+    broken = []  # (canonical url, url, error, from sitemap)
+    frontier = []
+    for u in urls:
+        # Sitemap URLs are checked as listed; dedup on their canonical form
+        key = url_canon.canonicalize(u)
+        if not visited.add(key):
+            referrers[key] = ([], 0)
+            frontier.append(u)
+    queued = len(frontier)
+
+    sitemap_broken = 0
+    urls_checked = 0
+    depth = 0
+    truncated = False
+
+    # --- Breadth-first: level 0 is the sitemap, each level follows links one step further ---
+    while frontier and urls_checked < max_urls and not progress.stopped_early:
+        next_frontier = []
+
+        for page_url in frontier:
+            if urls_checked >= max_urls:
+                truncated = True
+                break
+            if progress.out_of_time():
+                break
+            progress.begin_page()
+            urls_checked += 1
+
+            page_key = url_canon.canonicalize(page_url)
+            expand = depth < max_depth and urlparse(page_url).hostname in site_hosts
+            error = ""
 
-    # --- Check ONLY the sitemap URLs ---
-    for page_url in urls:
-        try:
-            # Prefer HEAD for speed; fall back to GET if blocked
             try:
-                r = requests.head(
-                    page_url,
-                    headers=headers,
-                    allow_redirects=True,
-                    verify=certifi.where(),
-                    timeout=20
-                )
-                status = r.status_code
-
-                # Some sites return 405/403 to HEAD; retry with GET
-                if status in (403, 405):
-                    r = requests.get(
+                if expand:
+                    # Need the body to follow links, so GET directly;
+                    # only HTML bodies are read, within the size cap
+                    r = session.get(
                         page_url,
                         headers=headers,
                         allow_redirects=True,
                         verify=certifi.where(),
-                        timeout=20
+                        timeout=split_timeout(20),
+                        stream=True
                     )
                     status = r.status_code
+                    if status < 400 and "html" in r.headers.get("Content-Type", "text/html"):
+                        read_body(r)
+                    else:
+                        r.close()
+                else:
+                    # HEAD first, GET fallback; shared per-run status cache
+                    r = None
+                    status, error = check_url_status(session, page_url, headers, timeout=20)
+
+                if status is not None and status >= 400:
+                    error = f"HTTP {status}"
+
+            except requests.RequestException as e:
+                r = None
+                error = str(e)
 
-            except requests.RequestException:
-                # If HEAD fails, try GET once
-                r = requests.get(
-                    page_url,
-                    headers=headers,
-                    allow_redirects=True,
-                    verify=certifi.where(),
-                    timeout=20
-                )
-                status = r.status_code
+            if error:
+                progress.error()
+                if depth == 0:
+                    sitemap_broken += 1
+                # Referrers found later (pages checked after this one) are still added
+                broken.append((page_key, page_url, error, depth == 0))
+                continue
+            referrers.pop(page_key, None)
 
-            if status >= 400:
-                broken_links.append([page_url, status, "HTTP error"])
+            if r is None or "html" not in r.headers.get("Content-Type", "text/html"):
+                continue
 
-        except requests.RequestException as e:
-            broken_links.append([page_url, "", str(e)])
+            page = page_cache.parse_response(r, parse_stats)
+            linked = set()  # a page linking to a URL twice (nav + footer) counts once
+            for href, _ in page.anchors:
+                if not href or href.startswith("#"):
+                    continue
+                # Requested as linked; deduped on the canonical form
+                link_url = url_canon.resolve(href, base=r.url or page_url)
+                if not link_url.startswith(("http://", "https://")):
+                    continue
+                if urlparse(link_url).hostname not in site_hosts or not link_rules.allows(link_url):
+                    continue
 
-    # --- Save to Excel ---
-    broken_df = pd.DataFrame(broken_links, columns=['Sitemap URL', 'Status Code', 'Error'])
-    excel_filename = "broken_links.xlsx"
-    broken_df.to_excel(excel_filename, index=False)
+                key = url_canon.canonicalize(link_url)
+                if key in linked:
+                    continue
+                linked.add(key)
+
+                if key in referrers:
+                    # Queued or already found broken: record this page as a referrer
+                    kept, count = referrers[key]
+                    if len(kept) < MAX_REFERRERS_PER_URL and page_url not in kept:
+                        kept.append(page_url)
+                    referrers[key] = (kept, count + 1)
+                elif key in visited:
+                    continue  # already checked and fine
+                elif queued >= max_urls:
+                    truncated = True  # enough queued to fill CRAWL_MAX_URLS
+                else:
+                    visited.add(key)
+                    referrers[key] = ([page_url], 1)
+                    next_frontier.append(link_url)
+                    queued += 1
+
+        frontier = next_frontier
+        progress.add_pages(len(frontier))
+        depth += 1
+
+    broken_links = []
+    for key, url, error, from_sitemap in broken:
+        pages, total = referrers.get(key, ([], 0))
+        source = "\n".join((["(sitemap)"] if from_sitemap else []) + pages)
+        if total > len(pages):
+            source += f"\n(+{total - len(pages)} more)"
+        broken_links.append(BrokenLinkRow(source, url, error))
+
+    # --- Optional local Excel copy (SAVE_LOCAL_EXCEL=1) ---
+    excel_filename = progress.local_excel_path("broken_links.xlsx")
+    if excel_filename:
+        broken_df = pd.DataFrame(broken_links, columns=BrokenLinkRow.COLUMNS)
+        broken_df.to_excel(excel_filename, index=False)
 
     summary = (
-        f"Checked {len(urls)} sitemap URLs. "
-        f"Found {len(broken_links)} broken sitemap URLs. "
-        f"See {excel_filename} for details."
+        f"Checked {min(urls_checked, len(urls))} of {len(urls)} sitemap URLs. "
+        f"Found {sitemap_broken} broken sitemap URLs. "
+    )
+    if max_depth:
+        summary += (
+            f"Deep crawl (depth {max_depth}): {urls_checked} URLs checked"
+            f"{' (stopped at CRAWL_MAX_URLS)' if truncated else ''}, "
+            f"broken links found: {len(broken_links)}. {parse_stats.summary()} "
+        )
+    summary += (
+        f"{f'See {excel_filename} for details. ' if excel_filename else ''}"
+        f"{sitemap.estimate_summary(sample_info, sitemap_broken, min(urls_checked, len(urls)), 'are broken')}"
     )
-    return summary, broken_links
\ No newline at end of file
+    return summary, broken_links
@@ -0,0 +1,220 @@
+# cli.py
+"""
+Headless runner for scheduled/large crawls: runs the same generators as the
+web form and writes the report straight to disk, with no web worker or
+HTTP timeout involved.
+
+Examples:
+    python cli.py broken-link metadata --max-pages 0 -o nightly.xlsx
+    python cli.py all --workers 4 --format json -o nightly.json
+    python cli.py find-text-url --find-text-url "DDR5" --sitemap https://example.com/sitemap.xml
+    python cli.py broken-link image --sites "Main | https://www.micron.com/" --sites https://example.com/sitemap.xml
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import result_store
+import run_context
+from report_runner import ASSET_REPORTS, REPORTS, build_workbook, generate_reports, order_report_data, report_rows
+
+OUTPUT_FORMATS = ("xlsx", "csv", "json")
+
+# Seconds between progress lines for in-process runs
+PROGRESS_INTERVAL_SECONDS = 15
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _run_group(keys, form, ends_at=0):
+    """
+    Worker entry point: run some reports in their own RunContext.
+    ends_at is the run's wall-clock deadline (time.time(), 0 = none), so a
+    group that waited in the pool's queue only gets the time that is left.
+    """
+    time_budget = max(ends_at - time.time(), 0.001) if ends_at else 0
+    with run_context.use(run_context.RunContext(reports_total=len(keys), time_budget=time_budget)):
+        return generate_reports(keys, form, use_cache=False)
+
+
+def _groups(selected):
+    """
+    Split the selected reports into independent units of work. Image, PDF,
+    Asset 404 and Page Weight share per-run asset results, so they stay together.
+    """
+    assets = [k for k in selected if k in ASSET_REPORTS]
+    groups = [[k] for k in selected if k not in ASSET_REPORTS]
+    if assets:
+        groups.append(assets)
+    return groups
+
+
+def run(selected, form, workers=1, time_budget=0):
+    """
+    Run the selected reports, in-process (workers=1) or across a process pool.
+    time_budget (seconds, 0 = none) applies to the whole run, including any
+    time groups spend queued for a worker.
+    Returns (report_data in run order, failures as [(keys, error)]).
+    """
+    if workers <= 1:
+        ctx = run_context.RunContext(reports_total=len(selected), time_budget=time_budget)
+        stop = threading.Event()
+
+        def report_progress():
+            while not stop.wait(PROGRESS_INTERVAL_SECONDS):
+                snap = ctx.snapshot()
+                _log(f"  {snap['report']}: {snap['pages_done']}/{snap['pages_total']} pages, {snap['errors']} errors")
+
+        threading.Thread(target=report_progress, daemon=True).start()
+        try:
+            with run_context.use(ctx):
+                report_data = generate_reports(selected, form, use_cache=False)
+        finally:
+            stop.set()
+        for report_type, summary, _, _ in report_data:
+            _log(f"Done: {report_type}: {summary}")
+        return report_data, []
+
+    report_data = []
+    failures = []
+    ends_at = time.time() + time_budget if time_budget else 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_group, keys, form, ends_at): keys for keys in _groups(selected)}
+        for future in as_completed(futures):
+            keys = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                failures.append((keys, e))
+                _log(f"Failed: {', '.join(keys)}: {e}")
+                continue
+            for report_type, summary, _, _ in results:
+                _log(f"Done: {report_type}: {summary}")
+            report_data.extend(results)
+    return order_report_data(report_data), failures
+
+
+def write_output(report_data, path, fmt):
+    """Write report_data to path as xlsx (same layout as the web download), csv or json."""
+    if fmt == "xlsx":
+        build_workbook(report_data, path)
+        return
+
+    if fmt == "json":
+        payload = [
+            {
+                "report_type": report_type,
+                "summary": summary,
+                "headers": headers,
+                "rows": [dict(zip(headers, row)) for row in report_rows(details, headers)],
+            }
+            for report_type, summary, details, headers in report_data
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2, default=str)
+        return
+
+    # csv: one file, same sections as the workbook's "Report Summary" sheet
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Report Type", "Details"])
+        for report_type, summary, details, headers in report_data:
+            writer.writerow([report_type, summary])
+            if details:
+                writer.writerow([])
+                writer.writerow(headers)
+                writer.writerows(report_rows(details, headers))
+                writer.writerow([])
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run site health reports without the web app.")
+    parser.add_argument(
+        "reports", nargs="+", choices=list(REPORTS) + ["all"],
+        help="reports to run ('all' = every report that needs no extra input)",
+    )
+    parser.add_argument("-o", "--output", help="output file (default site_health_report.<format>)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="output format (default: from --output extension, else xlsx)")
+    parser.add_argument("--workers", type=int, default=1, help="processes to spread reports over (default 1)")
+    parser.add_argument("--max-pages", type=int, help="sitemap pages per report, 0 = all (sets MAX_SITEMAP_PAGES)")
+    parser.add_argument("--sitemap", help="sitemap URL (sets SITEMAP_URL)")
+    parser.add_argument(
+        "--sites", action="append", default=[],
+        help="site to crawl, \"URL\" or \"Name | URL\" (repeatable, or @file with one per line); "
+             "several sites are crawled concurrently (default SITES_FILE, else --sitemap)",
+    )
+    parser.add_argument("--find-text-url", default="", help="keyword for the find-text-url report")
+    parser.add_argument("--find-text-pdf", default="", help="keyword for the find-text-pdf report")
+    parser.add_argument("--asset-urls", default="", help="page URLs for asset-404 (whitespace separated, or @file)")
+    parser.add_argument("--time-budget", type=float, help="finish within this many minutes, partial reports included (default RUN_TIME_BUDGET_SECONDS)")
+    parser.add_argument("--no-store", action="store_true", help="do not save the run to the result store")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+
+    if "all" in args.reports:
+        selected = [k for k in REPORTS if k not in ("find-text-url", "find-text-pdf", "asset-404")]
+    else:
+        selected = [k for k in REPORTS if k in args.reports]
+
+    fmt = args.format
+    if not fmt:
+        ext = os.path.splitext(args.output or "")[1].lstrip(".").lower()
+        fmt = ext if ext in OUTPUT_FORMATS else "xlsx"
+    output = args.output or f"site_health_report.{fmt}"
+
+    # Generators read these from the environment; worker processes inherit them
+    if args.max_pages is not None:
+        os.environ["MAX_SITEMAP_PAGES"] = str(args.max_pages)
+    if args.sitemap:
+        os.environ["SITEMAP_URL"] = args.sitemap
+
+    asset_urls = args.asset_urls
+    if asset_urls.startswith("@"):
+        with open(asset_urls[1:], encoding="utf-8") as f:
+            asset_urls = f.read()
+
+    site_lines = []
+    for value in args.sites:
+        if value.startswith("@"):
+            with open(value[1:], encoding="utf-8") as f:
+                value = f.read()
+        site_lines.append(value)
+
+    form = {
+        "sites": "\n".join(site_lines),
+        "find_text_url": args.find_text_url,
+        "find_text_pdf": args.find_text_pdf,
+        "asset_404_urls": asset_urls,
+    }
+
+    time_budget = run_context.get_time_budget(args.time_budget)
+    _log(
+        f"Running {', '.join(selected)} with {max(args.workers, 1)} worker(s)"
+        + (f", time budget {time_budget / 60:g} min" if time_budget else "")
+    )
+    report_data, failures = run(selected, form, args.workers, time_budget)
+
+    write_output(report_data, output, fmt)
+    _log(f"Wrote {output}")
+
+    if not args.no_store and result_store.is_enabled() and report_data:
+        try:
+            _log(f"Saved run {result_store.save_run(report_data)}")
+        except Exception as e:
+            _log(f"Could not save run to result store: {e}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
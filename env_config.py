@@ -0,0 +1,21 @@
+# env_config.py
+"""
+Numeric settings read from environment variables. A missing or unparsable
+value falls back to the default, so a typo in the environment never stops
+a run.
+"""
+import os
+
+
+def get_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def get_float(name, default):
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
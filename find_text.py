@@ -1,44 +1,56 @@
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-import xml.etree.ElementTree as ET
+
+import run_context
+import sitemap
+import url_rules
+import visible_text
+from http_client import BodyTooLarge, split_timeout
 
 
 def find_text_in_url(keyword):
-    sitemap_url = "https://www.micron.com/sitemap.xml"
+    sitemap_url = sitemap.get_sitemap_url()
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/56.0.2924.76 Safari/537.36'
     }
-    response = requests.get(sitemap_url, headers=headers)
-    response.raise_for_status()
-    sitemap_xml = response.text
-    root = ET.fromstring(sitemap_xml)
-    namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-    urls = []
-    for url in root.findall('ns:url', namespace):
-        loc_tag = url.find('ns:loc', namespace)
-        if loc_tag is not None and loc_tag.text:
-            urls.append(loc_tag.text)
+    session = run_context.current().session()
+    entries = sitemap.fetch_sitemap_entries(session, sitemap_url, headers, timeout=20)
+    urls = [e.loc for e in entries]
+    urls = url_rules.get_rules("find-text-url", "pages").filter(urls)
+
+    progress = run_context.current()
+    progress.add_pages(len(urls))
 
     found_urls = []
+    too_large = 0
     for url in urls:
+        if progress.out_of_time():
+            break
+        progress.begin_page()
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            visible_text = soup.get_text(separator=' ', strip=True)
-            if keyword.lower() in visible_text.lower():
-                found_urls.append(url)
+            # Streamed: the scanner stops downloading once the keyword is seen
+            with session.get(url, headers=headers, stream=True, timeout=split_timeout(20)) as response:
+                response.raise_for_status()
+                if visible_text.response_contains(response, keyword):
+                    found_urls.append(url)
+        except BodyTooLarge:
+            progress.error()
+            too_large += 1
+            continue
         except requests.RequestException:
+            progress.error()
             continue
 
-    # THIS IS THE FIX:
-    output_df = pd.DataFrame(found_urls, columns=['URL'])
-    # Alternative safe way:
-    # output_df = pd.DataFrame([[url] for url in found_urls], columns=['URL'])
-
-    excel_filename = f"output_{keyword}_search.xlsx"
-    output_df.to_excel(excel_filename, index=False)
+    # Optional local copy (SAVE_LOCAL_EXCEL=1)
+    excel_filename = progress.local_excel_path(f"output_{keyword}_search.xlsx")
+    if excel_filename:
+        pd.DataFrame(found_urls, columns=['URL']).to_excel(excel_filename, index=False)
 
-    summary = f"Keyword '{keyword}' found in {len(found_urls)} pages. See {excel_filename} for details."
+    summary = f"Keyword '{keyword}' found in {len(found_urls)} pages."
+    if excel_filename:
+        summary += f" See {excel_filename} for details."
+    if too_large:
+        summary += f" Pages skipped for exceeding the size cap: {too_large}."
+    if progress.stopped_early:
+        summary += f" {progress.coverage_note()}"
     return summary, found_urls
@@ -1,68 +1,93 @@
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import xml.etree.ElementTree as ET
-from urllib.parse import urljoin
 import fitz  # PyMuPDF
 import os
 
+import page_cache
+import run_context
+import sitemap
+import url_canon
+import url_rules
+from http_client import BodyTooLarge, download_to_tempfile, fetch
+from report_schema import PdfTextRow
+
 def find_text_in_pdf(keyword):
-    sitemap_url = "https://www.micron.com/sitemap.xml"
+    sitemap_url = sitemap.get_sitemap_url()
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/56.0.2924.76 Safari/537.36'
     }
 
+    session = run_context.current().session()
+
     try:
-        response = requests.get(sitemap_url, headers=headers)
-        response.raise_for_status()
-        sitemap_xml = response.text
-        root = ET.fromstring(sitemap_xml)
-        namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        urls = []
-        for url in root.findall('ns:url', namespace):
-            loc_tag = url.find('ns:loc', namespace)
-            if loc_tag is not None and loc_tag.text:
-                urls.append(loc_tag.text)
+        entries = sitemap.fetch_sitemap_entries(session, sitemap_url, headers, timeout=20)
     except requests.RequestException as e:
         return f"Failed to fetch sitemap: {e}", []
+    except ET.ParseError as e:
+        return f"Failed to parse sitemap XML: {e}", []
+    urls = url_rules.get_rules("find-text-pdf", "pages").filter([e.loc for e in entries])
 
+    link_rules = url_rules.get_rules("find-text-pdf", "links")
+    progress = run_context.current()
+    progress.add_pages(len(urls))
     matching_pdfs = []
+    too_large = 0
+    parse_stats = page_cache.ParseStats()
 
     for i, url in enumerate(urls):
+        if progress.out_of_time():
+            break
+        progress.begin_page()
         try:
-            page_response = requests.get(url, headers=headers)
+            page_response = fetch(session, url, headers=headers, timeout=20)
             page_response.raise_for_status()
-            soup = BeautifulSoup(page_response.text, 'html.parser')
+            page = page_cache.parse_response(page_response, parse_stats)
 
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if href.lower().endswith('.pdf'):
-                    pdf_url = urljoin(url, href) if href.startswith('/') else href
-                    pdf_response = requests.get(pdf_url, headers=headers)
-                    if pdf_response.status_code == 200:
-                        temp_pdf = "temp.pdf"
-                        with open(temp_pdf, "wb") as f:
-                            f.write(pdf_response.content)
-                        try:
-                            with fitz.open(temp_pdf) as doc:
-                                page_texts = []
-                                for j in range(doc.page_count):
-                                    page = doc.load_page(j)
-                                    page_text = page.get_text()
-                                    if isinstance(page_text, str):
-                                        page_texts.append(page_text)
-                                text = "\n".join(page_texts)
-                            if keyword.lower() in text.lower():
-                                matching_pdfs.append({'PDF File': pdf_url, 'Found Text': keyword})
-                        except Exception as e:
-                            continue
-                        finally:
-                            os.remove(temp_pdf)
+            for href, _ in page.anchors:
+                pdf_url = url_canon.resolve(href, base=page_response.url or url)
+                if link_rules.allows(pdf_url):
+                    progress.asset_checked()
+                    # Streamed to a private temp file; never held in memory whole
+                    try:
+                        temp_pdf = download_to_tempfile(session, pdf_url, suffix=".pdf", headers=headers, timeout=30)
+                    except BodyTooLarge:
+                        progress.error()
+                        too_large += 1
+                        continue
+                    except requests.RequestException:
+                        continue
+                    try:
+                        # Page by page, stopping at the first page with a match
+                        needle = keyword.lower()
+                        found = False
+                        with fitz.open(temp_pdf) as doc:
+                            for j in range(doc.page_count):
+                                page_text = doc.load_page(j).get_text()
+                                if isinstance(page_text, str) and needle in page_text.lower():
+                                    found = True
+                                    break
+                        if found:
+                            matching_pdfs.append(PdfTextRow(pdf_url, keyword))
+                    except Exception as e:
+                        continue
+                    finally:
+                        os.remove(temp_pdf)
         except requests.RequestException:
+            progress.error()
             continue
 
-    excel_filename = f"pdfs_with_{keyword}.xlsx"
-    pd.DataFrame(matching_pdfs).to_excel(excel_filename, index=False)
+    # Optional local copy (SAVE_LOCAL_EXCEL=1)
+    excel_filename = progress.local_excel_path(f"pdfs_with_{keyword}.xlsx")
+    if excel_filename:
+        pd.DataFrame(matching_pdfs, columns=PdfTextRow.COLUMNS).to_excel(excel_filename, index=False)
 
-    summary = f"Checked {len(urls)} pages. Found {len(matching_pdfs)} PDFs containing '{keyword}'. See {excel_filename} for details."
+    summary = (
+        f"Checked {len(urls)} pages. Found {len(matching_pdfs)} PDFs containing '{keyword}'. "
+        f"{f'See {excel_filename} for details. ' if excel_filename else ''}{parse_stats.summary()}"
+    )
+    if too_large:
+        summary += f" PDFs skipped for exceeding the size cap: {too_large}."
+    if progress.stopped_early:
+        summary += f" {progress.coverage_note()}"
     return summary, matching_pdfs
\ No newline at end of file
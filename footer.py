@@ -1,12 +1,17 @@
 import pandas as pd
-from bs4 import BeautifulSoup, Tag
-from urllib.parse import urljoin
 
-from http_client import get_session
+import page_cache
+import run_context
+import sites
+import url_canon
+import url_rules
+from http_client import fetch
+from link_checker import check_url_status
+from report_schema import NavLinkRow
 
 
 def generate_footer_nav_report():
-    session = get_session()
+    session = run_context.current().session()
 
     headers = {
         "User-Agent": (
@@ -15,82 +20,65 @@ def generate_footer_nav_report():
         )
     }
 
-    # ✅ 7 locales with labels
-    sites = [
-        ("EN", "https://www.micron.com/"),
-    ]
+    # Locale homepages (label, URL) of the site being checked; see sites.py
+    locales = sites.current().locales
 
     all_rows = []
     broken_rows = []
-
-    for country, page_url in sites:
+    progress = run_context.current()
+    progress.add_pages(len(locales))
+    link_rules = url_rules.get_rules("footer", "links")
+
+    for country, page_url in locales:
+        if progress.out_of_time():
+            break
+        progress.begin_page()
         # Fetch locale homepage
         try:
-            resp = session.get(page_url, headers=headers, timeout=15)
+            resp = fetch(session, page_url, headers=headers, timeout=15)
             resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
+            page = page_cache.parse_response(resp)
         except Exception as e:
-            row = {
-                "Country": country,
-                "Page URL": page_url,
-                "Link Text": "(homepage)",
-                "Link URL": page_url,
-                "Status Code": "",
-                "Error": f"Failed to fetch homepage: {e}",
-            }
+            row = NavLinkRow(country, page_url, "(homepage)", page_url, "", f"Failed to fetch homepage: {e}")
+            progress.error()
             broken_rows.append(row)
             all_rows.append(row)
             continue
 
-        footer = soup.find("footer")
-        links = footer.find_all("a", href=True) if isinstance(footer, Tag) else []
-
-        for a in links:
-            href = (a.get("href") or "").strip()
-            text = a.get_text(strip=True)
-
-            # Skip non-links
-            if (not href) or href.startswith("#") or href.lower().startswith(("javascript:", "mailto:", "tel:")):
+        for href, text in page.footer_links:
+            # Skip in-page anchors
+            if (not href) or href.startswith("#"):
                 continue
 
             # Resolve relative links per locale
-            link_url = urljoin(page_url if page_url.endswith("/") else page_url + "/", href)
+            link_url = url_canon.resolve(href, base=page_url if page_url.endswith("/") else page_url + "/")
+            if not link_rules.allows(link_url):
+                continue
 
-            status_code = ""
-            error = ""
+            progress.asset_checked()
 
-            try:
-                # HEAD first for speed; fallback to GET if blocked
-                r = session.head(link_url, headers=headers, allow_redirects=True, timeout=15)
-                status_code = r.status_code
-                if status_code in (403, 405):  # HEAD blocked
-                    r = session.get(link_url, headers=headers, allow_redirects=True, timeout=15)
-                    status_code = r.status_code
-            except Exception as e:
-                error = str(e)
+            # HEAD first for speed; fallback to GET if blocked (cached per run)
+            status, error = check_url_status(session, link_url, headers, timeout=15)
+            status_code = status if status is not None else ""
 
-            row = {
-                "Country": country,
-                "Page URL": page_url,
-                "Link Text": text,
-                "Link URL": link_url,
-                "Status Code": status_code,
-                "Error": error,
-            }
+            row = NavLinkRow(country, page_url, text, link_url, status_code, error)
             all_rows.append(row)
 
             # Broken = request error OR HTTP >= 400
             if error or (isinstance(status_code, int) and status_code >= 400):
+                progress.error()
                 broken_rows.append(row)
 
-    excel_filename = "micron_footer_links_report_7_sites.xlsx"
-    with pd.ExcelWriter(excel_filename, engine="openpyxl") as writer:
-        pd.DataFrame(all_rows).to_excel(writer, sheet_name="All Links", index=False)
-        pd.DataFrame(broken_rows).to_excel(writer, sheet_name="Broken Links", index=False)
+    # Optional local copy with every link, not just broken ones (SAVE_LOCAL_EXCEL=1)
+    excel_filename = progress.local_excel_path("footer_links.xlsx")
+    if excel_filename:
+        with pd.ExcelWriter(excel_filename, engine="openpyxl") as writer:
+            pd.DataFrame(all_rows, columns=NavLinkRow.COLUMNS).to_excel(writer, sheet_name="All Links", index=False)
+            pd.DataFrame(broken_rows, columns=NavLinkRow.COLUMNS).to_excel(writer, sheet_name="Broken Links", index=False)
 
     summary = (
-        f"Footer checked for {len(sites)} locales. "
+        f"Footer checked for {len(locales)} locales. "
         f"Total links: {len(all_rows)}. Broken: {len(broken_rows)}. "
-        f"Saved: {excel_filename}"
+        f"{f'Saved: {excel_filename}. ' if excel_filename else ''}{progress.coverage_note()}"
     )
     return summary, broken_rows
\ No newline at end of file
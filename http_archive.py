@@ -0,0 +1,173 @@
+# http_archive.py
+import io
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# HTTP_ARCHIVE_MODE:
+#   off     - normal network access (default)
+#   record  - every exchange made through http_client sessions is saved
+#   replay  - answered from the archive only; unknown requests fail like
+#             a connection error, so nothing ever touches the network
+ARCHIVE_MODES = ("off", "record", "replay")
+DEFAULT_ARCHIVE_PATH = "http_archive.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (
+    method       TEXT NOT NULL,
+    url          TEXT NOT NULL,
+    range_header TEXT NOT NULL DEFAULT '',
+    status       INTEGER NOT NULL,
+    reason       TEXT,
+    headers_json TEXT NOT NULL,
+    body         BLOB NOT NULL,
+    recorded_at  TEXT NOT NULL,
+    PRIMARY KEY (method, url, range_header)
+);
+"""
+
+# Archives recorded before range_header existed: keyed by (method, url) only
+_MIGRATE_V1 = """
+ALTER TABLE exchanges RENAME TO exchanges_v1;
+{schema}
+INSERT INTO exchanges (method, url, status, reason, headers_json, body, recorded_at)
+    SELECT method, url, status, reason, headers_json, body, recorded_at FROM exchanges_v1;
+DROP TABLE exchanges_v1;
+""".format(schema=_SCHEMA)
+
+
+def archive_mode():
+    mode = os.getenv("HTTP_ARCHIVE_MODE", "off").strip().lower()
+    return mode if mode in ARCHIVE_MODES else "off"
+
+
+def archive_path():
+    return os.getenv("HTTP_ARCHIVE_PATH", DEFAULT_ARCHIVE_PATH)
+
+
+class _ArchivedBody(io.BytesIO):
+    """File-like body for rebuilt responses; accepts urllib3-style read() arguments."""
+
+    def read(self, amt=None, decode_content=True):
+        return super().read(-1 if amt is None else amt)
+
+
+class ArchiveAdapter(BaseAdapter):
+    """
+    Transport adapter that records exchanges to, or replays them from, a
+    SQLite archive (one row per method + URL + Range header, body
+    zlib-compressed, so a partial Range GET never replaces the full GET of
+    the same URL). In record mode requests go out through the session's own
+    adapter (http_client's shared LimitedAdapter), keeping its connection limits.
+
+    Bodies are stored decoded (gzip/br already removed) and at most one byte
+    past the http_client size cap for their Content-Type, so a replayed
+    oversized body still trips BodyTooLarge. Headers are kept verbatim.
+    Redirects are archived hop by hop, since requests follows them above
+    the adapter. Replayed responses report near-zero elapsed times.
+    """
+
+    def __init__(self, mode, path, network):
+        super().__init__()
+        self.mode = mode
+        self.path = path
+        self.network = network  # adapter that sends recorded requests
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(exchanges)")}
+            if "range_header" not in columns:
+                with conn:
+                    conn.executescript(_MIGRATE_V1)
+            self._local.conn = conn
+        return conn
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        range_header = request.headers.get("Range", "")
+        if self.mode == "replay":
+            row = self._conn().execute(
+                "SELECT status, reason, headers_json, body FROM exchanges"
+                " WHERE method = ? AND url = ? AND range_header = ?",
+                (request.method, request.url, range_header),
+            ).fetchone()
+            if row is None:
+                raise requests.ConnectionError(f"Not in HTTP archive: {request.method} {request.url}", request=request)
+            status, reason, headers_json, body = row
+            return self._build(request, status, reason, json.loads(headers_json), zlib.decompress(body))
+
+        resp = self.network.send(request, stream=True, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        body = self._read_capped(resp)
+        headers = dict(resp.headers)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO exchanges"
+                " (method, url, range_header, status, reason, headers_json, body, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    request.method,
+                    request.url,
+                    range_header,
+                    resp.status_code,
+                    resp.reason,
+                    json.dumps(headers),
+                    zlib.compress(body),
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                ),
+            )
+        return self._build(request, resp.status_code, resp.reason, headers, body)
+
+    @staticmethod
+    def _read_capped(resp):
+        # Imported here: http_client imports this module to build sessions
+        from http_client import max_body_bytes
+
+        if resp.request.method == "HEAD":
+            resp.close()
+            return b""
+        limit = max_body_bytes(resp.headers.get("Content-Type", ""))
+        try:
+            body = resp.raw.read(limit + 1 if limit else None, decode_content=True) or b""
+        finally:
+            resp.close()
+        return body
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _build(self, request, status, reason, headers, body):
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = reason
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.raw = _ArchivedBody(body)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+
+def mount(session):
+    """Route a session through the archive when HTTP_ARCHIVE_MODE is record/replay."""
+    mode = archive_mode()
+    if mode == "off":
+        return session
+    # Wraps the session's current adapters (http_client's shared LimitedAdapter)
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, ArchiveAdapter(mode, archive_path(), session.get_adapter(prefix)))
+    return session
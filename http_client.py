@@ -1,6 +1,100 @@
- #http_client.py
+#http_client.py
 import os
+import tempfile
+import threading
+from contextlib import nullcontext
+from functools import lru_cache
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+
+import env_config
+import http_archive
+
+# Largest body read per content type, in MB (0 = no cap); bigger bodies are
+# abandoned and surface as BodyTooLarge findings instead of filling memory.
+# Override with MAX_BODY_MB="text/html=10,application/pdf=50,image/*=20,*=20"
+DEFAULT_MAX_BODY_MB = {
+    "text/html": 10,
+    "application/xml": 50,
+    "text/xml": 50,
+    "application/pdf": 100,
+    "*": 20,
+}
+
+# Bytes read from the socket per chunk
+CHUNK_SIZE = 64 * 1024
+
+
+# Seconds allowed to establish a TCP/TLS connection. A dead host fails in
+# CONNECT_TIMEOUT instead of the much longer per-request read timeout.
+# READ_TIMEOUT (0 = keep each caller's own value) overrides read timeouts.
+CONNECT_TIMEOUT = env_config.get_float("CONNECT_TIMEOUT", 5)
+READ_TIMEOUT = env_config.get_float("READ_TIMEOUT", 0)
+
+# Requests in flight at once across the whole process (HTTP_MAX_CONNECTIONS)
+# and per host (HTTP_MAX_PER_HOST); 0 = unlimited. Shared by every session,
+# so sites and reports crawled concurrently stay polite to each host.
+MAX_CONNECTIONS = env_config.get_int("HTTP_MAX_CONNECTIONS", 16)
+MAX_PER_HOST = env_config.get_int("HTTP_MAX_PER_HOST", 4)
+
+_adapter_lock = threading.Lock()
+_shared_adapter = None
+
+
+class BodyTooLarge(requests.RequestException):
+    """Response body is larger than the cap configured for its content type."""
+
+    def __init__(self, url, content_type, limit, size=None):
+        self.url = url
+        self.content_type = content_type
+        self.limit = limit
+        self.size = size
+        seen = f"{size:,} bytes" if size is not None else f"over {limit:,} bytes"
+        super().__init__(
+            f"Body too large: {seen} of {content_type or 'unknown type'} (limit {limit:,} bytes)"
+        )
+
+
+class LimitedAdapter(HTTPAdapter):
+    """
+    Transport adapter shared by all sessions: one connection pool per host
+    for the whole process, and a cap on requests in flight globally and per
+    host. A slot is held until the response headers arrive; streamed bodies
+    are read after it is released.
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_per_host=MAX_PER_HOST):
+        super().__init__(pool_connections=64, pool_maxsize=max(max_per_host, 10))
+        self.max_per_host = max_per_host
+        self._global = threading.BoundedSemaphore(max_connections) if max_connections > 0 else None
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        if self.max_per_host <= 0:
+            return None
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.BoundedSemaphore(self.max_per_host)
+        return slot
+
+    def send(self, request, **kwargs):
+        # Host slot first, so a request queued for a busy host holds no global slot
+        with self._host_slot(request.url) or nullcontext(), self._global or nullcontext():
+            return super().send(request, **kwargs)
+
+
+def shared_adapter():
+    """The process-wide LimitedAdapter (created on first use)."""
+    global _shared_adapter
+    with _adapter_lock:
+        if _shared_adapter is None:
+            _shared_adapter = LimitedAdapter()
+        return _shared_adapter
 
 
 def get_session() -> requests.Session:
@@ -9,6 +103,10 @@ def get_session() -> requests.Session:
 
     - If DISABLE_PROXY=1, ignore proxy-related environment variables.
     - Otherwise, requests will honor HTTP_PROXY/HTTPS_PROXY (if set).
+    - HTTP_ARCHIVE_MODE=record|replay saves every exchange to, or serves it
+      from, the archive at HTTP_ARCHIVE_PATH (see http_archive.py).
+    - Otherwise every session uses the shared LimitedAdapter: one connection
+      pool and the HTTP_MAX_CONNECTIONS / HTTP_MAX_PER_HOST limits.
 
     This makes the app work both on corporate networks (proxy required)
     and on public hosts like Render (no corporate proxy DNS).
@@ -19,4 +117,104 @@ def get_session() -> requests.Session:
     if os.getenv("DISABLE_PROXY", "0") == "1":
         s.trust_env = False
 
-    return s
\ No newline at end of file
+    adapter = shared_adapter()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return http_archive.mount(s)
+
+
+def split_timeout(timeout):
+    """(connect, read) timeout tuple for a caller's single timeout value."""
+    if isinstance(timeout, tuple):
+        return timeout
+    return (CONNECT_TIMEOUT, READ_TIMEOUT or timeout)
+
+
+@lru_cache(maxsize=1)
+def _body_limits(raw):
+    limits = dict(DEFAULT_MAX_BODY_MB)
+    for item in raw.split(","):
+        ctype, _, mb = item.partition("=")
+        try:
+            limits[ctype.strip().lower()] = float(mb)
+        except ValueError:
+            continue
+    return {ctype: int(mb * 1024 * 1024) for ctype, mb in limits.items()}
+
+
+def max_body_bytes(content_type):
+    """Body cap in bytes for a Content-Type header value (0 = unlimited)."""
+    limits = _body_limits(os.getenv("MAX_BODY_MB", ""))
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    if ctype in limits:
+        return limits[ctype]
+    return limits.get(ctype.split("/")[0] + "/*", limits["*"])
+
+
+def iter_body(resp, chunk_size=CHUNK_SIZE):
+    """
+    Yield the body of a streamed (stream=True) response in chunks.
+
+    Raises BodyTooLarge, and closes the connection, as soon as the declared
+    Content-Length or the bytes actually read exceed the cap for the
+    response's Content-Type.
+    """
+    content_type = resp.headers.get("Content-Type", "")
+    limit = max_body_bytes(content_type)
+
+    if limit:
+        try:
+            declared = int(resp.headers.get("Content-Length", ""))
+        except ValueError:
+            declared = None
+        if declared is not None and declared > limit:
+            resp.close()
+            raise BodyTooLarge(resp.url, content_type, limit, declared)
+
+    read = 0
+    for chunk in resp.iter_content(chunk_size=chunk_size):
+        read += len(chunk)
+        if limit and read > limit:
+            resp.close()
+            raise BodyTooLarge(resp.url, content_type, limit)
+        yield chunk
+
+
+def read_body(resp):
+    """
+    Load a streamed response's body (within its cap) so .content/.text work
+    as for a normal request. Returns resp.
+    """
+    try:
+        resp._content = b"".join(iter_body(resp))
+    finally:
+        resp.close()
+    return resp
+
+
+def fetch(session, url, **kwargs):
+    """session.get() with the body streamed in and capped by content type."""
+    if kwargs.get("timeout") is not None:
+        kwargs["timeout"] = split_timeout(kwargs["timeout"])
+    return read_body(session.get(url, stream=True, **kwargs))
+
+
+def download_to_tempfile(session, url, suffix="", **kwargs):
+    """
+    Stream a successful response to a private temporary file, chunk by chunk.
+    Returns the file path; the caller removes it. Raises for HTTP errors and
+    BodyTooLarge (the partial file is removed).
+    """
+    if kwargs.get("timeout") is not None:
+        kwargs["timeout"] = split_timeout(kwargs["timeout"])
+    with session.get(url, stream=True, **kwargs) as resp:
+        resp.raise_for_status()
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter_body(resp):
+                    f.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+    return path
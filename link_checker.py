@@ -0,0 +1,270 @@
+# link_checker.py
+import time
+import certifi
+import threading
+import requests
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+from urllib3.exceptions import NewConnectionError
+
+import env_config
+import run_context
+import url_canon
+from http_client import split_timeout
+
+
+# Give up on chains longer than this (requests' own default is 30)
+MAX_REDIRECT_HOPS = env_config.get_int("MAX_REDIRECT_HOPS", 10)
+
+# Circuit breaker: after this many consecutive connect/DNS failures on a
+# host (0 = off), its URLs fail immediately with a host-level error; one
+# request is let through every CIRCUIT_REPROBE_SECONDS to see if it is back
+CIRCUIT_FAILURES = env_config.get_int("CIRCUIT_FAILURES", 3)
+CIRCUIT_REPROBE_SECONDS = env_config.get_float("CIRCUIT_REPROBE_SECONDS", 60)
+
+_health_lock = threading.Lock()
+
+
+class Hop(NamedTuple):
+    url: str
+    status: int
+    elapsed_ms: int
+    location: str = ""  # absolute next URL for redirects, "" for the final response
+
+
+class LinkResult(NamedTuple):
+    status: int | None
+    error: str
+    hops: tuple = ()  # every response in the chain, redirects first, final response last
+    loop: bool = False
+    # From the final response's headers (kept for the Page Weight report)
+    content_length: int | None = None
+    content_type: str = ""
+    content_encoding: str = ""
+    cache_control: str = ""
+    expires: str = ""
+    etag: str = ""
+
+    @property
+    def redirects(self):
+        return sum(1 for h in self.hops if h.location)
+
+    @property
+    def final_url(self):
+        return self.hops[-1].url if self.hops else ""
+
+    @property
+    def total_ms(self):
+        return sum(h.elapsed_ms for h in self.hops)
+
+
+class HostHealth:
+    """Consecutive connection failures for one host, and when its circuit opened."""
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None  # time.monotonic() when tripped, None while closed
+        self.last_error = ""
+
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+
+def _host_blocked(ctx, host):
+    """
+    Error message if host's circuit is open, else "". Once the re-probe
+    interval has passed, one caller gets "" (a trial request) and the
+    interval restarts.
+    """
+    if CIRCUIT_FAILURES <= 0:
+        return ""
+    with _health_lock:
+        health = ctx.host_health.get(host)
+        if health is None or health.opened_at is None:
+            return ""
+        if time.monotonic() - health.opened_at >= CIRCUIT_REPROBE_SECONDS:
+            health.opened_at = time.monotonic()
+            return ""
+        return (
+            f"Host unreachable ({health.failures} connection failures, "
+            f"not retried for {CIRCUIT_REPROBE_SECONDS:g}s): {health.last_error}"
+        )
+
+
+def _record_host(ctx, host, error=None):
+    """Track connect-level failures per host; any response closes the circuit."""
+    if CIRCUIT_FAILURES <= 0:
+        return
+    with _health_lock:
+        health = ctx.host_health.setdefault(host, HostHealth())
+        if error is None:
+            health.failures = 0
+            health.opened_at = None
+            return
+        health.failures += 1
+        health.last_error = error
+        if health.failures >= CIRCUIT_FAILURES:
+            health.opened_at = time.monotonic()
+
+
+def _is_connect_failure(exc):
+    """
+    True if exc means no connection could be made at all (connect timeout,
+    refused, DNS failure), as opposed to a server that accepted the
+    connection and then dropped or garbled the response.
+    """
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    seen = set()
+    stack = [exc]
+    while stack:
+        e = stack.pop()
+        if e is None or id(e) in seen:
+            continue
+        seen.add(id(e))
+        if isinstance(e, NewConnectionError):  # includes NameResolutionError
+            return True
+        # requests wraps urllib3's MaxRetryError, whose .reason is the real error
+        stack.extend([getattr(e, "reason", None), e.__cause__, e.__context__])
+        stack.extend(a for a in getattr(e, "args", ()) if isinstance(a, BaseException))
+    return False
+
+
+def _request_hop(session, url, headers, timeout):
+    """
+    One request without following redirects.
+    HEAD first for speed; GET for 403/405 or HEAD failures (body is not downloaded).
+    A HEAD that cannot connect at all is not retried as a GET; one the server
+    dropped (e.g. a WAF that refuses HEAD) is.
+    """
+    timeout = split_timeout(timeout)
+    try:
+        r = session.head(
+            url,
+            headers=headers,
+            allow_redirects=False,
+            verify=certifi.where(),
+            timeout=timeout,
+        )
+        if r.status_code not in (403, 405):
+            return r
+    except Exception as e:
+        # DNS, refused, connect timeout: a GET would fail the same way
+        if _is_connect_failure(e):
+            raise
+
+    r = session.get(
+        url,
+        headers=headers,
+        allow_redirects=False,
+        verify=certifi.where(),
+        timeout=timeout,
+        stream=True,
+    )
+    r.close()
+    return r
+
+
+def _final_result(hop, hops, resp_headers) -> LinkResult:
+    try:
+        content_length = int(resp_headers.get("Content-Length", ""))
+    except ValueError:
+        content_length = None
+    return LinkResult(
+        hop.status,
+        "",
+        hops,
+        content_length=content_length,
+        content_type=resp_headers.get("Content-Type", "").split(";")[0].strip().lower(),
+        content_encoding=resp_headers.get("Content-Encoding", "").lower(),
+        cache_control=resp_headers.get("Cache-Control", "").lower(),
+        expires=resp_headers.get("Expires", ""),
+        etag=resp_headers.get("ETag", ""),
+    )
+
+
+def check_url(session, url: str, headers, timeout=15) -> LinkResult:
+    """
+    Follow url's redirect chain hop by hop, recording status and latency per hop.
+
+    Per run (on the current RunContext):
+    - every redirect hop is kept in redirect_map, so a later chain passing
+      through a known hop (e.g. http -> https -> www) skips that request
+    - the full result is kept in status_cache, keyed by url's canonical form
+      (url_canon.canonicalize), so equivalent URLs are requested once; the
+      request itself goes to url exactly as given
+    - hosts that keep failing to connect are short-circuited (see CIRCUIT_FAILURES)
+
+    timeout is the read timeout; connecting is bounded by CONNECT_TIMEOUT
+    (see http_client.split_timeout).
+    """
+    ctx = run_context.current()
+    key = url_canon.canonicalize(url)
+    cached = ctx.status_cache.get(key)
+    if cached is not None:
+        return cached
+
+    hops = []
+    seen = set()
+    current = url
+
+    while True:
+        if current in seen:
+            result = LinkResult(None, f"Redirect loop at {current}", tuple(hops), loop=True)
+            break
+        if len(hops) >= MAX_REDIRECT_HOPS:
+            result = LinkResult(None, f"Too many redirects ({len(hops)})", tuple(hops))
+            break
+        seen.add(current)
+
+        # Rest of the chain already resolved earlier in the run
+        if current != url:
+            known = ctx.status_cache.get(url_canon.canonicalize(current))
+            if known is not None:
+                chain = tuple(hops) + known.hops
+                redirects = [h for h in chain if h.location]
+                if len(redirects) >= MAX_REDIRECT_HOPS:
+                    result = LinkResult(None, f"Too many redirects ({MAX_REDIRECT_HOPS})", tuple(redirects[:MAX_REDIRECT_HOPS]))
+                else:
+                    result = known._replace(hops=chain)
+                break
+
+        hop = ctx.redirect_map.get(current)
+        if hop is None:
+            host = _host(current)
+            blocked = _host_blocked(ctx, host)
+            if blocked:
+                result = LinkResult(None, blocked, tuple(hops))
+                break
+            try:
+                r = _request_hop(session, current, headers, timeout)
+            except Exception as e:
+                if _is_connect_failure(e):
+                    _record_host(ctx, host, str(e))
+                result = LinkResult(None, str(e), tuple(hops))
+                break
+            _record_host(ctx, host)
+
+            location = urljoin(current, r.headers["Location"]) if r.is_redirect else ""
+            hop = Hop(current, r.status_code, int(r.elapsed.total_seconds() * 1000), location)
+            if location:
+                ctx.redirect_map[current] = hop
+
+        hops.append(hop)
+        if not hop.location:
+            result = _final_result(hop, tuple(hops), r.headers)
+            break
+        current = hop.location
+
+    ctx.status_cache[key] = result
+    return result
+
+
+def check_url_status(session, url: str, headers, timeout=15):
+    """
+    Final status of url after redirects, checked at most once per run.
+    Returns (status_code:int|None, error:str)
+    """
+    result = check_url(session, url, headers, timeout)
+    return result.status, result.error
@@ -1,29 +1,83 @@
 # metadata_link.py
-import os
+import hashlib
 import certifi
 import requests
 import pandas as pd
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+from collections import Counter
 
-from http_client import get_session
+import env_config
+import page_cache
+import run_context
+import sitemap
+import url_rules
+from http_client import BodyTooLarge, fetch
+from report_schema import MetadataRow
+
+
+def _group_key(text):
+    """
+    Short hash of case/whitespace-normalized text. Pages are grouped by this
+    key in one pass, so duplicate detection is linear in the number of pages.
+    """
+    if not text:
+        return None
+    normalized = " ".join(text.lower().split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
+def _classify_error(e):
+    """Short, groupable label for why a page could not be fetched."""
+    if isinstance(e, BodyTooLarge):
+        return "Body too large"
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return f"HTTP {e.response.status_code}"
+    if isinstance(e, requests.exceptions.Timeout):
+        return "Timeout"
+    if isinstance(e, requests.exceptions.SSLError):
+        return "SSL error"
+    if isinstance(e, requests.exceptions.TooManyRedirects):
+        return "Too many redirects"
+    if isinstance(e, requests.exceptions.ConnectionError):
+        msg = str(e)
+        if any(s in msg for s in ("NameResolution", "Name or service not known", "getaddrinfo", "nodename nor servname")):
+            return "DNS failure"
+        return "Connection error"
+    if isinstance(e, requests.exceptions.InvalidURL):
+        return "Invalid URL"
+    return type(e).__name__
+
+
+def _og(page, prop):
+    for name, content in page.og:
+        if name == prop:
+            return content
+    return ""
 
 
 def generate_metadata_report():
     """
-    Checks pages from the sitemap for missing metadata fields:
-    - <title>
-    - meta[name="description"]
-    - meta[name="keywords"]
+    Extracts metadata from sitemap pages and flags problems:
+    - <title>, meta description, meta keywords (missing or too long)
+    - <link rel="canonical">, meta robots (noindex), hreflang alternates
+    - og:title / og:description / og:image
+    - <h1> (missing or more than one)
+    - titles and descriptions shared by more than one page
+
+    Duplicates are found by grouping pages on a hash of the normalized text
+    while pages are fetched, so there is no pairwise comparison.
+    Unreachable pages are listed with the error type (Timeout, HTTP 404, ...).
+
+    - METADATA_TITLE_MAX: title length flagged as too long (default 60)
+    - METADATA_DESCRIPTION_MAX: description length flagged as too long (default 160)
 
     Returns:
         summary (str)
-        details (list[list])  # rows matching headers in app.py
+        details (list[MetadataRow])
     """
 
-    session = get_session()
+    session = run_context.current().session()
 
-    sitemap_url = os.getenv("SITEMAP_URL", "https://www.micron.com/sitemap.xml")
+    sitemap_url = sitemap.get_sitemap_url()
     headers = {
         "User-Agent": (
             "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 "
@@ -31,82 +85,143 @@ def generate_metadata_report():
         )
     }
 
+    title_max = env_config.get_int("METADATA_TITLE_MAX", 60)
+    description_max = env_config.get_int("METADATA_DESCRIPTION_MAX", 160)
+
     # Optional limit to prevent long runtime on Render
-    # Set MAX_SITEMAP_PAGES=0 to scan all pages
-    try:
-        max_pages = int(os.getenv("MAX_SITEMAP_PAGES", "250"))
-    except ValueError:
-        max_pages = 250
+    # Set MAX_SITEMAP_PAGES=0 to scan all pages; SAMPLE_MODE/SAMPLE_SEED pick which pages
+    max_pages = sitemap.get_max_pages()
 
     # Fetch sitemap
     try:
-        response = session.get(
-            sitemap_url,
-            headers=headers,
-            verify=certifi.where(),
-            timeout=30
-        )
-        response.raise_for_status()
-        root = ET.fromstring(response.content)
-
-        urls = [
-            elem.text.strip()
-            for elem in root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-            if elem.text
-        ]
-
-        if max_pages > 0:
-            urls = urls[:max_pages]
-
+        entries = sitemap.fetch_sitemap_entries(session, sitemap_url, headers)
     except Exception as e:
         # ✅ Always return a tuple to avoid app.py unpacking crash
         return f"Failed to fetch sitemap: {e}", []
 
-    data = []
+    page_rules = url_rules.get_rules("metadata", "pages")
+    entries = [e for e in entries if page_rules.allows(e.loc)]
+    urls, sample_info = sitemap.select_urls(entries, max_pages)
+
+    progress = run_context.current()
+    progress.add_pages(len(urls))
+
+    # One compact record (the row minus duplicate counts and issues) per
+    # reachable page; duplicate counts are only known once every page has
+    # been seen, so rows are finished after the loop.
+    records = []
+    title_groups = Counter()
+    description_groups = Counter()
+    unreachable = []
+    error_types = Counter()
+    pages_missing = 0
+    parse_stats = page_cache.ParseStats()
 
     for url in urls:
+        if progress.out_of_time():
+            break
+        progress.begin_page()
         try:
-            res = session.get(url, headers=headers, verify=certifi.where(), timeout=20)
+            res = fetch(session, url, headers=headers, verify=certifi.where(), timeout=20)
             res.raise_for_status()
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            title_tag = soup.find("title")
-            title = title_tag.text.strip() if title_tag and title_tag.text else ""
-
-            description_tag = soup.find("meta", {"name": "description"})
-            description = description_tag.get("content", "").strip() if description_tag else ""
-
-            keywords_tag = soup.find("meta", {"name": "keywords"})
-            keywords = keywords_tag.get("content", "").strip() if keywords_tag else ""
-
-            # record only if anything is missing
-            if not title or not description or not keywords:
-                data.append([
-                    url,
-                    title,
-                    description,
-                    keywords,
-                    len(title),
-                    len(description),
-                    len(keywords)
-                ])
+            page = page_cache.parse_response(res, parse_stats)
+        except Exception as e:
+            progress.error()
+            error_type = _classify_error(e)
+            error_types[error_type] += 1
+            unreachable.append(MetadataRow(url, issues="Unreachable", error_type=error_type))
+            continue
+
+        title_key = _group_key(page.title)
+        description_key = _group_key(page.description)
+        if title_key:
+            title_groups[title_key] += 1
+        if description_key:
+            description_groups[description_key] += 1
+        if not page.title or not page.description or not page.keywords:
+            pages_missing += 1
+
+        # Only the fields the row needs; the parsed page (anchors, images,
+        # nav/footer links) is dropped here so memory stays flat on big sites
+        record = MetadataRow(
+            url,
+            page.title,
+            page.description,
+            page.keywords,
+            len(page.title),
+            len(page.description),
+            len(page.keywords),
+            page.canonical,
+            page.robots,
+            ", ".join(lang for lang, _ in page.hreflang),
+            _og(page, "og:title"),
+            _og(page, "og:description"),
+            _og(page, "og:image"),
+            page.h1s[0] if page.h1s else "",
+            len(page.h1s),
+        )
+        records.append((record, title_key, description_key, bool(page.og)))
 
-        except Exception:
-            # Keep a row so the report shows it was not reachable
-            data.append([url, "", "", "", 0, 0, 0])
+    data = []
+    issue_counts = Counter()
+    for record, title_key, description_key, has_og in records:
+        title_dupes = title_groups[title_key] if title_key else 0
+        description_dupes = description_groups[description_key] if description_key else 0
+
+        issues = []
+        if not record.title:
+            issues.append("Missing title")
+        elif record.title_chars > title_max:
+            issues.append(f"Title over {title_max} chars")
+        if not record.description:
+            issues.append("Missing description")
+        elif record.description_chars > description_max:
+            issues.append(f"Description over {description_max} chars")
+        if not record.keywords:
+            issues.append("Missing keywords")
+        if title_dupes > 1:
+            issues.append("Duplicate title")
+        if description_dupes > 1:
+            issues.append("Duplicate description")
+        if not record.canonical:
+            issues.append("Missing canonical")
+        if "noindex" in record.robots.lower():
+            issues.append("Noindex")
+        if not record.h1_count:
+            issues.append("Missing H1")
+        elif record.h1_count > 1:
+            issues.append("Multiple H1")
+        if not has_og:
+            issues.append("Missing OG tags")
+
+        if not issues:
+            continue
+        issue_counts.update(issues)
+
+        data.append(record._replace(
+            same_title=title_dupes if title_dupes > 1 else "",
+            same_description=description_dupes if description_dupes > 1 else "",
+            issues="; ".join(issues),
+        ))
+
+    data.extend(unreachable)
 
     # Optional local save (useful on your machine, not needed on Render)
-    if os.getenv("SAVE_LOCAL_EXCEL", "0") == "1":
-        df = pd.DataFrame(
-            data,
-            columns=[
-                "URL", "Title Tag", "Meta Description", "Meta Keywords",
-                "Title Tag Character Count", "Meta Description Character Count", "Meta Keywords Character Count"
-            ]
-        )
-        df.to_excel("micron_empty_metadata_report.xlsx", index=False)
-
+    excel_filename = progress.local_excel_path("micron_empty_metadata_report.xlsx")
+    if excel_filename:
+        df = pd.DataFrame(data, columns=MetadataRow.COLUMNS)
+        df.to_excel(excel_filename, index=False)
+
+    duplicate_titles = sum(1 for n in title_groups.values() if n > 1)
+    duplicate_descriptions = sum(1 for n in description_groups.values() if n > 1)
+    errors = ", ".join(f"{k}: {v}" for k, v in error_types.most_common()) or "none"
+    top_issues = ", ".join(f"{k}: {v}" for k, v in issue_counts.most_common(5)) or "none"
     summary = (
-        f"Checked {len(urls)} pages. Pages with empty metadata: {len(data)}."
+        f"Checked {progress.pages_done} of {len(urls)} pages ({len(records)} reachable). "
+        f"Pages with metadata issues: {len(data) - len(unreachable)}. Most common: {top_issues}. "
+        f"Titles shared by several pages: {duplicate_titles}; descriptions: {duplicate_descriptions}. "
+        f"Unreachable: {len(unreachable)} ({errors}). "
+        f"{parse_stats.summary()} "
+        f"{sitemap.estimate_summary(sample_info, pages_missing, len(records), 'have empty metadata')}"
     )
-    return summary, data
\ No newline at end of file
+    return summary, data
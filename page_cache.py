@@ -0,0 +1,161 @@
+# page_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from bs4 import BeautifulSoup, Tag
+
+import env_config
+
+# Number of distinct page bodies whose parse results are kept (LRU)
+PARSE_CACHE_SIZE = env_config.get_int("PARSE_CACHE_SIZE", 256)
+
+
+@dataclass(frozen=True)
+class ParsedPage:
+    """
+    Everything the report generators extract from a page body.
+
+    URLs are kept exactly as written in the HTML (not resolved), because the
+    same body can be served from different URLs; callers resolve them
+    against their own page URL.
+    """
+
+    anchors: tuple          # ((href, text), ...) for every <a href>
+    images: tuple           # ((src, data_src, srcset, data_srcset), ...) for every <img>
+    source_srcsets: tuple   # (srcset, ...) for every <source srcset>
+    nav_links: tuple        # ((href, text), ...) inside the first <nav>
+    footer_links: tuple     # ((href, text), ...) inside the first <footer>
+    title: str
+    description: str
+    keywords: str
+    canonical: str          # <link rel="canonical" href>
+    robots: str             # <meta name="robots" content>
+    hreflang: tuple         # ((lang, href), ...) from <link rel="alternate" hreflang>
+    og: tuple               # (("og:title", content), ...) from <meta property="og:*">
+    h1s: tuple              # text of every <h1>
+
+
+class ParseStats:
+    """Per-run counters: how many bodies were parsed vs reused from the cache."""
+
+    def __init__(self):
+        self.parsed = 0
+        self.reused = 0
+
+    def summary(self):
+        return f"Pages parsed: {self.parsed}, reused from identical bodies: {self.reused}."
+
+
+def _links(container):
+    if not isinstance(container, Tag):
+        return ()
+    return tuple(
+        ((a.get("href") or "").strip(), a.get_text(strip=True))
+        for a in container.find_all("a", href=True)
+    )
+
+
+def _meta_content(soup, name):
+    tag = soup.find("meta", {"name": name})
+    return (tag.get("content", "") or "").strip() if isinstance(tag, Tag) else ""
+
+
+def _link_rels(soup):
+    """(canonical href, ((hreflang, href), ...)) from <link> tags."""
+    canonical = ""
+    hreflang = []
+    for link in soup.find_all("link", href=True):
+        rels = [r.lower() for r in (link.get("rel") or [])]
+        if "canonical" in rels and not canonical:
+            canonical = (link.get("href") or "").strip()
+        elif "alternate" in rels and link.get("hreflang"):
+            hreflang.append((link.get("hreflang").strip(), (link.get("href") or "").strip()))
+    return canonical, tuple(hreflang)
+
+
+def _parse(html):
+    soup = BeautifulSoup(html, "html.parser")
+
+    title_tag = soup.find("title")
+    canonical, hreflang = _link_rels(soup)
+
+    return ParsedPage(
+        anchors=_links(soup),
+        images=tuple(
+            (
+                (img.get("src") or "").strip(),
+                (img.get("data-src") or "").strip(),
+                (img.get("srcset") or "").strip(),
+                (img.get("data-srcset") or "").strip(),
+            )
+            for img in soup.find_all("img")
+        ),
+        source_srcsets=tuple(
+            (source.get("srcset") or "").strip() for source in soup.find_all("source")
+        ),
+        nav_links=_links(soup.find("nav")),
+        footer_links=_links(soup.find("footer")),
+        title=title_tag.text.strip() if title_tag and title_tag.text else "",
+        description=_meta_content(soup, "description"),
+        keywords=_meta_content(soup, "keywords"),
+        canonical=canonical,
+        robots=_meta_content(soup, "robots"),
+        hreflang=hreflang,
+        og=tuple(
+            (meta.get("property").strip().lower(), (meta.get("content") or "").strip())
+            for meta in soup.find_all("meta", property=True)
+            if meta.get("property").strip().lower().startswith("og:")
+        ),
+        h1s=tuple(h1.get_text(" ", strip=True) for h1 in soup.find_all("h1")),
+    )
+
+
+class ParseCache:
+    """
+    LRU of ParsedPage keyed by a hash of the raw response body; each
+    RunContext owns one.
+
+    Byte-identical bodies (locale variants, paginated listings, shared
+    templates) are parsed by BeautifulSoup only once.
+    """
+
+    def __init__(self, max_entries=PARSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse_response(self, resp, stats=None):
+        """Return the ParsedPage for a requests Response, reusing a cached parse if possible."""
+        key = hashlib.blake2b(resp.content, digest_size=16).digest()
+
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+
+        if page is not None:
+            if stats is not None:
+                stats.reused += 1
+            return page
+
+        page = _parse(resp.text)
+        if stats is not None:
+            stats.parsed += 1
+
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = page
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return page
+
+
+def parse_response(resp, stats=None):
+    """Parse a page response through the current run's body-hash cache."""
+    # Imported here: run_context imports this module to create its cache
+    import run_context
+
+    return run_context.current().parse_cache.parse_response(resp, stats)
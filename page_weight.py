@@ -0,0 +1,112 @@
+# page_weight.py
+import env_config
+import run_context
+import url_canon
+from report_schema import PageWeightRow
+
+# Text-like types that should be served compressed
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
+
+# URLs listed per issue column before "(+N more)"
+MAX_LISTED_URLS = 5
+
+
+def _is_uncompressed(result):
+    if not result.content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return result.content_encoding in ("", "identity")
+
+
+def _is_uncacheable(result):
+    cc = result.cache_control
+    if any(d in cc for d in ("no-store", "no-cache", "private")):
+        return True
+    if "max-age=0" in cc.replace(" ", ""):
+        return True
+    return not cc and not result.expires
+
+
+def _listed(urls):
+    out = "\n".join(urls[:MAX_LISTED_URLS])
+    if len(urls) > MAX_LISTED_URLS:
+        out += f"\n(+{len(urls) - MAX_LISTED_URLS} more)"
+    return out
+
+
+def generate_page_weight_report():
+    """
+    Per-page image/PDF weight built from the asset checks already made in
+    this run by the Image, PDF and Asset 404 reports. No extra requests:
+    sizes, types, cache headers and timings come from the HEAD/GET
+    responses kept in the run's status cache.
+
+    - PAGE_WEIGHT_IMAGE_MAX_KB: images larger than this are flagged (default 300)
+
+    Returns:
+        summary (str)
+        rows (list[PageWeightRow])  # one per page, heaviest first
+    """
+    ctx = run_context.current()
+    max_image_bytes = env_config.get_int("PAGE_WEIGHT_IMAGE_MAX_KB", 300) * 1024
+
+    if not ctx.page_assets:
+        return (
+            "No asset data in this run. Select Image Links, PDF Links or Asset 404 "
+            "together with Page Weight."
+        ), []
+
+    rows = []
+    for page_url, assets in ctx.page_assets.items():
+        counts = {"Image": 0, "PDF": 0}
+        bytes_by_kind = {"Image": 0, "PDF": 0}
+        unknown_size = 0
+        slowest_url, slowest_ms = "", -1
+        uncompressed, uncacheable, oversized = [], [], []
+
+        for asset_url, kind in assets.items():
+            result = ctx.status_cache.get(url_canon.canonicalize(asset_url))
+            if result is None or result.status is None or result.status >= 400:
+                continue
+
+            counts[kind] += 1
+            if result.content_length is None:
+                unknown_size += 1
+            else:
+                bytes_by_kind[kind] += result.content_length
+                if kind == "Image" and result.content_length > max_image_bytes:
+                    oversized.append(asset_url)
+
+            if result.total_ms > slowest_ms:
+                slowest_url, slowest_ms = asset_url, result.total_ms
+            if _is_uncompressed(result):
+                uncompressed.append(asset_url)
+            if _is_uncacheable(result):
+                uncacheable.append(asset_url)
+
+        rows.append(PageWeightRow(
+            page_url,
+            images=counts["Image"],
+            image_bytes=bytes_by_kind["Image"],
+            pdfs=counts["PDF"],
+            pdf_bytes=bytes_by_kind["PDF"],
+            total_bytes=bytes_by_kind["Image"] + bytes_by_kind["PDF"],
+            unknown_size=unknown_size,
+            slowest_asset=slowest_url,
+            slowest_ttfb_ms=slowest_ms if slowest_url else "",
+            uncompressed_assets=_listed(uncompressed),
+            uncacheable_assets=_listed(uncacheable),
+            oversized_images=_listed(oversized),
+        ))
+
+    rows.sort(key=lambda r: r.total_bytes, reverse=True)
+
+    total = sum(r.total_bytes for r in rows)
+    heaviest = rows[0]
+    summary = (
+        f"Page weight for {len(rows)} pages from already-checked assets. "
+        f"Average image+PDF bytes per page: {total // len(rows):,}. "
+        f"Heaviest: {heaviest.page_url} ({heaviest.total_bytes:,} bytes). "
+        f"Pages with oversized images: {sum(1 for r in rows if r.oversized_images)}. "
+        f"Pages with uncacheable assets: {sum(1 for r in rows if r.uncacheable_assets)}."
+    )
+    return summary, rows
@@ -1,11 +1,15 @@
-import os
 import certifi
-from bs4 import BeautifulSoup
 import pandas as pd
-import xml.etree.ElementTree as ET
-from urllib.parse import urljoin
 
-from http_client import get_session
+import asset_validation
+import page_cache
+import run_context
+import sitemap
+import url_canon
+import url_rules
+from http_client import BodyTooLarge, fetch
+from link_checker import check_url_status
+from report_schema import BrokenPdfRow
 
 
 def generate_pdf_link_report():
@@ -14,16 +18,17 @@ def generate_pdf_link_report():
 
     Returns:
         summary (str)
-        broken_items (list[dict])  # keys: 'Page URL', 'Broken PDF URL', 'Error'
+        broken_items (list[BrokenPdfRow])
 
     Notes:
     - Uses HEAD first for speed; falls back to GET when HEAD is blocked.
     - Uses certifi CA bundle for consistent TLS verification.
     - Optionally limits pages scanned with MAX_SITEMAP_PAGES env var to avoid long runs.
+    - SAMPLE_MODE (first/random/stratified/priority) and SAMPLE_SEED choose which pages are scanned.
     """
-    session = get_session()
+    session = run_context.current().session()
 
-    sitemap_url = os.getenv("SITEMAP_URL", "https://www.micron.com/sitemap.xml")
+    sitemap_url = sitemap.get_sitemap_url()
     headers = {
         "User-Agent": (
             "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 "
@@ -32,91 +37,94 @@ def generate_pdf_link_report():
     }
 
     # Optional limit to prevent long runs/timeouts
-    try:
-        max_pages = int(os.getenv("MAX_SITEMAP_PAGES", "250"))
-    except ValueError:
-        max_pages = 250
+    # Set MAX_SITEMAP_PAGES=0 to scan all; SAMPLE_MODE/SAMPLE_SEED pick which pages
+    max_pages = sitemap.get_max_pages()
 
-    # Fetch sitemap
+    # Fetch sitemap safely
     try:
-        resp = session.get(sitemap_url, headers=headers, verify=certifi.where(), timeout=30)
-        resp.raise_for_status()
-        root = ET.fromstring(resp.text)
+        entries = sitemap.fetch_sitemap_entries(session, sitemap_url, headers)
     except Exception as e:
         return f"Failed to fetch sitemap: {e}", []
 
-    namespace = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-    urls = []
-    for url_node in root.findall("ns:url", namespace):
-        loc_tag = url_node.find("ns:loc", namespace)
-        if loc_tag is not None and loc_tag.text:
-            urls.append(loc_tag.text.strip())
+    # Apply include/exclude rules before any page is requested
+    page_rules = url_rules.get_rules("pdf", "pages")
+    entries = [e for e in entries if page_rules.allows(e.loc)]
+    link_rules = url_rules.get_rules("pdf", "links")
+
+    urls, sample_info = sitemap.select_urls(entries, max_pages)
 
-    if max_pages > 0:
-        urls = urls[:max_pages]
+    progress = run_context.current()
+    progress.add_pages(len(urls))
 
     broken_items = []
     pages_checked = 0
+    pages_scanned = 0
+    pages_with_broken = 0
     pdfs_checked = 0
+    parse_stats = page_cache.ParseStats()
+    validate = asset_validation.is_enabled()
+    invalid = 0
 
     for page_url in urls:
+        if progress.out_of_time():
+            break
+        progress.begin_page()
         pages_checked += 1
 
         # Fetch page HTML
         try:
-            page_resp = session.get(page_url, headers=headers, verify=certifi.where(), timeout=30)
+            page_resp = fetch(session, page_url, headers=headers, verify=certifi.where(), timeout=30)
             page_resp.raise_for_status()
+        except BodyTooLarge as e:
+            # Oversized pages are a finding in their own right
+            progress.error()
+            broken_items.append(BrokenPdfRow(page_url, "", str(e)))
+            continue
         except Exception:
             continue
 
-        soup = BeautifulSoup(page_resp.text, "html.parser")
+        page = page_cache.parse_response(page_resp, parse_stats)
+        pages_scanned += 1
+        broken_before = len(broken_items)
 
         # Extract PDF links
-        for link in soup.find_all("a", href=True):
-            href = (link.get("href") or "").strip()
-            if not href or not href.lower().endswith(".pdf"):
+        for href, _ in page.anchors:
+            if not href:
                 continue
 
-            pdf_url = urljoin(page_url, href) if href.startswith("/") else href
+            # Default rules match ".pdf" paths, including "?download" variants
+            # Relative to the page as served (after redirects), not the sitemap URL
+            pdf_url = url_canon.resolve(href, base=page_resp.url or page_url)
+            if not link_rules.allows(pdf_url):
+                continue
             pdfs_checked += 1
-
-            try:
-                r = session.head(
-                    pdf_url,
-                    headers=headers,
-                    allow_redirects=True,
-                    verify=certifi.where(),
-                    timeout=20,
-                )
-                status = r.status_code
-
-                if status in (403, 405):
-                    r = session.get(
-                        pdf_url,
-                        headers=headers,
-                        allow_redirects=True,
-                        verify=certifi.where(),
-                        timeout=20,
-                    )
-                    status = r.status_code
-
-                if status >= 400:
-                    broken_items.append(
-                        {"Page URL": page_url, "Broken PDF URL": pdf_url, "Error": status}
-                    )
-
-            except Exception as e:
-                broken_items.append(
-                    {"Page URL": page_url, "Broken PDF URL": pdf_url, "Error": str(e)}
-                )
+            progress.asset_checked()
+
+            # HEAD first, GET fallback; each canonical URL is requested once per run
+            status, err = check_url_status(session, pdf_url, headers, timeout=20)
+            progress.record_asset(page_url, pdf_url, "PDF")
+            if validate and not err and status < 400:
+                # A 200 can still be a soft-404 HTML page or a broken file
+                err = asset_validation.validate_asset(session, pdf_url, "PDF", headers)
+                invalid += 1 if err else 0
+            if err or status >= 400:
+                progress.error()
+                broken_items.append(BrokenPdfRow(page_url, pdf_url, err or status))
+
+        if len(broken_items) > broken_before:
+            pages_with_broken += 1
 
     # Optional: save local file when running locally
-    if os.getenv("SAVE_LOCAL_EXCEL", "0") == "1":
-        pd.DataFrame(broken_items).to_excel("broken_pdf_links.xlsx", index=False)
+    excel_filename = progress.local_excel_path("broken_pdf_links.xlsx")
+    if excel_filename:
+        pd.DataFrame(broken_items, columns=BrokenPdfRow.COLUMNS).to_excel(excel_filename, index=False)
 
     summary = (
         f"Checked {pages_checked} pages. "
         f"Checked {pdfs_checked} PDF links. "
-        f"Broken PDF links found: {len(broken_items)}."
+        f"Broken PDF links found: {len(broken_items)}. "
+        f"{f'Of which invalid content (range-checked): {invalid}. ' if validate else ''}"
+        f"{parse_stats.summary()} "
+        f"{sitemap.estimate_summary(sample_info, pages_with_broken, pages_scanned, 'have broken PDF links')}"
     )
     return summary, broken_items
\ No newline at end of file
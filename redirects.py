@@ -0,0 +1,136 @@
+# redirects.py
+import certifi
+from urllib.parse import urlparse
+
+import env_config
+import page_cache
+import run_context
+import sitemap
+import url_canon
+import url_rules
+from http_client import fetch
+from link_checker import check_url
+from report_schema import RedirectRow
+
+
+def _format_chain(result):
+    parts = [f"{h.url} ({h.status}, {h.elapsed_ms} ms)" for h in result.hops]
+    if result.loop:
+        parts.append("↺ loop")
+    return " → ".join(parts)
+
+
+def generate_redirect_report():
+    """
+    Crawl sitemap pages and the in-domain links on them, and flag redirect
+    chains longer than REDIRECT_MAX_HOPS (default 1) as well as redirect loops.
+
+    Every chain is walked hop by hop through link_checker, so hops already
+    seen in this run (by this or another report) are not requested again.
+
+    Returns:
+        summary (str)
+        rows (list[RedirectRow])
+    """
+    session = run_context.current().session()
+
+    sitemap_url = sitemap.get_sitemap_url()
+    headers = {
+        "User-Agent": (
+            "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/56.0.2924.76 Safari/537.36"
+        )
+    }
+
+    max_hops = env_config.get_int("REDIRECT_MAX_HOPS", 1)
+
+    # Optional limit to prevent long runs/timeouts
+    max_pages = sitemap.get_max_pages()
+
+    try:
+        entries = sitemap.fetch_sitemap_entries(session, sitemap_url, headers)
+    except Exception as e:
+        return f"Failed to fetch sitemap: {e}", []
+
+    page_rules = url_rules.get_rules("redirects", "pages")
+    link_rules = url_rules.get_rules("redirects", "links")
+    entries = [e for e in entries if page_rules.allows(e.loc)]
+    urls, _ = sitemap.select_urls(entries, max_pages)
+    site_hosts = {urlparse(u).hostname for u in urls}
+
+    progress = run_context.current()
+    progress.add_pages(len(urls))
+    parse_stats = page_cache.ParseStats()
+
+    rows = []
+    seen = set()
+    chains_checked = 0
+    redirected = 0
+
+    def inspect(found_on, url):
+        nonlocal chains_checked, redirected
+        key = url_canon.canonicalize(url)
+        if key in seen:
+            return None
+        seen.add(key)
+        progress.asset_checked()
+        chains_checked += 1
+
+        result = check_url(session, url, headers, timeout=20)
+        if result.redirects:
+            redirected += 1
+
+        if result.loop:
+            issue = "Redirect loop"
+        elif result.redirects > max_hops:
+            issue = f"Chain of {result.redirects} redirects (max {max_hops})"
+        else:
+            return result
+
+        progress.error()
+        rows.append(RedirectRow(
+            found_on,
+            url,
+            result.redirects,
+            _format_chain(result),
+            result.status if result.status is not None else result.error,
+            result.total_ms,
+            issue,
+        ))
+        return result
+
+    for page_url in urls:
+        if progress.out_of_time():
+            break
+        progress.begin_page()
+        result = inspect("(sitemap)", page_url)
+        if result is None or result.status != 200:
+            continue
+
+        # Fetch the final page once to find its links
+        try:
+            page_resp = fetch(session, result.final_url, headers=headers, verify=certifi.where(), timeout=30)
+            page_resp.raise_for_status()
+        except Exception:
+            continue
+        page = page_cache.parse_response(page_resp, parse_stats)
+
+        for href, _ in page.anchors:
+            if not href or href.startswith("#"):
+                continue
+            # The body is the final page's, so its links are relative to that URL
+            link_url = url_canon.resolve(href, base=result.final_url)
+            if not link_url.startswith(("http://", "https://")):
+                continue
+            if urlparse(link_url).hostname not in site_hosts or not link_rules.allows(link_url):
+                continue
+            inspect(page_url, link_url)
+
+    loops = sum(1 for r in rows if r.issue == "Redirect loop")
+    summary = (
+        f"Checked {progress.pages_done} of {len(urls)} pages and {chains_checked} unique URLs. "
+        f"Redirected: {redirected}. "
+        f"Chains longer than {max_hops} hop(s): {len(rows) - loops}. Loops: {loops}. "
+        f"{parse_stats.summary()} {progress.coverage_note()}"
+    )
+    return summary, rows
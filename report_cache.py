@@ -0,0 +1,97 @@
+# report_cache.py
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import env_config
+import sitemap
+from http_client import get_session
+
+# Finished results are reused for this long (REPORT_CACHE_TTL seconds, 0 = off)
+DEFAULT_TTL_SECONDS = 3600
+
+# Entries kept at most (REPORT_CACHE_MAX_ENTRIES); whole-request XLSX bytes
+# count as one entry each, so keep this modest
+DEFAULT_MAX_ENTRIES = 64
+
+# The sitemap is re-fetched for its fingerprint at most this often
+FINGERPRINT_TTL_SECONDS = 60
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (expires_at, value)
+_fingerprints = {}  # sitemap URL -> (value, expires_at)
+
+
+def ttl_seconds():
+    return env_config.get_int("REPORT_CACHE_TTL", DEFAULT_TTL_SECONDS)
+
+
+def is_enabled():
+    return ttl_seconds() > 0
+
+
+def make_key(kind, parts, fingerprint):
+    """Stable key for JSON-serializable parts of a request plus the site fingerprint."""
+    raw = json.dumps([kind, parts, fingerprint], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get(key):
+    """Cached value for key, or None if missing/expired."""
+    now = time.monotonic()
+    with _lock:
+        hit = _entries.get(key)
+        if hit is None:
+            return None
+        expires, value = hit
+        if expires <= now:
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return value
+
+
+def put(key, value):
+    max_entries = env_config.get_int("REPORT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+    with _lock:
+        _entries[key] = (time.monotonic() + ttl_seconds(), value)
+        _entries.move_to_end(key)
+        while len(_entries) > max(max_entries, 1):
+            _entries.popitem(last=False)
+
+
+def site_fingerprint():
+    """
+    Hash of the current site's sitemap (loc, lastmod) pairs, so cached
+    results are dropped as soon as pages are added, removed or marked as
+    changed. Returns "" if the sitemap cannot be fetched (callers then skip
+    caching).
+    """
+    url = sitemap.get_sitemap_url()
+    now = time.monotonic()
+    with _lock:
+        known = _fingerprints.get(url)
+        if known is not None and known[1] > now:
+            return known[0]
+
+    headers = {
+        "User-Agent": (
+            "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/56.0.2924.76 Safari/537.36"
+        )
+    }
+    try:
+        entries = sitemap.fetch_sitemap_entries(get_session(), url, headers)
+    except Exception:
+        return ""
+
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        digest.update(f"{entry.loc}\t{entry.lastmod}\n".encode("utf-8"))
+    value = f"{url}#{len(entries)}#{digest.hexdigest()}"
+
+    with _lock:
+        _fingerprints[url] = (value, now + FINGERPRINT_TTL_SECONDS)
+    return value
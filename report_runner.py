@@ -0,0 +1,368 @@
+# report_runner.py
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from openpyxl import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+from typing import cast, Any
+from io import BytesIO
+
+# Import report generator modules
+import broken_link
+import header
+import footer
+import image_link
+import metadata_link
+import pdf_link
+import find_text
+import find_text_pdf
+import asset_404
+import redirects
+import page_weight
+
+import env_config
+import report_cache
+import report_schema
+import run_context
+import sites
+
+# report key -> (report type shown in the output, column headers).
+# Headers come from each report's row type in report_schema.
+# Dict order is the run order; Page Weight must stay last because it is
+# built from the asset checks made by the Image, PDF and Asset 404 reports.
+REPORTS = {
+    "broken-link": ("Broken Link", list(report_schema.BrokenLinkRow.COLUMNS)),
+    "header": ("Header Navigation", list(report_schema.NavLinkRow.COLUMNS)),
+    "footer": ("Footer Navigation", list(report_schema.NavLinkRow.COLUMNS)),
+    "image": ("Image Links", list(report_schema.BrokenImageRow.COLUMNS)),
+    "metadata": ("Metadata", list(report_schema.MetadataRow.COLUMNS)),
+    "pdf": ("PDF Links", list(report_schema.BrokenPdfRow.COLUMNS)),
+    "redirects": ("Redirects", list(report_schema.RedirectRow.COLUMNS)),
+    "find-text-url": ("Find Text in URL", ["URL"]),
+    "find-text-pdf": ("Find Text in PDF", list(report_schema.PdfTextRow.COLUMNS)),
+    "asset-404": ("Asset 404", list(report_schema.Asset404Row.COLUMNS)),
+    "page-weight": ("Page Weight", list(report_schema.PageWeightRow.COLUMNS)),
+}
+
+# Reports that share per-run asset data and so must run in the same process
+ASSET_REPORTS = ("image", "pdf", "asset-404", "page-weight")
+
+# Reports built from data already collected in the run (no requests of their own)
+OFFLINE_REPORTS = ("page-weight",)
+
+# Sites crawled at once in a multi-site run (MAX_PARALLEL_SITES)
+DEFAULT_PARALLEL_SITES = 4
+
+
+def _max_parallel_sites():
+    return max(env_config.get_int("MAX_PARALLEL_SITES", DEFAULT_PARALLEL_SITES), 1)
+
+
+def _safe_append_row(ws: Worksheet, row: Any, headers: list[str] | None = None) -> None:
+    """
+    Append a row to an openpyxl worksheet safely.
+
+    Supports:
+    - report_schema rows (or any tuple as long as headers): appended as-is, positionally
+    - dict: values pulled in header order
+    - list/tuple: appended as-is (optionally padded/trimmed to headers length)
+    - scalar: written into a single cell
+
+    This prevents crashes when a report returns list-of-lists.
+    Anything with an append() method works as ws (e.g. a plain list).
+    """
+    if isinstance(row, tuple) and headers and len(row) == len(headers):
+        ws.append(row)
+        return
+
+    if isinstance(row, dict):
+        if not headers:
+            for k, v in row.items():
+                ws.append([k, v])
+            return
+        ws.append([row.get(h, "") for h in headers])
+        return
+
+    if isinstance(row, (list, tuple)):
+        vals = list(row)
+        if headers:
+            if len(vals) < len(headers):
+                vals += [""] * (len(headers) - len(vals))
+            elif len(vals) > len(headers):
+                vals = vals[: len(headers)]
+        ws.append(vals)
+        return
+
+    ws.append([row])
+
+
+def _form_inputs(form: dict[str, str]) -> dict[str, str]:
+    """Keyword/URL inputs, accepting the alternative field names older forms used."""
+    return {
+        "find_text_url": (form.get("find_text_url") or form.get("find_text_url_keyword") or "").strip(),
+        "find_text_pdf": (form.get("find_text_pdf") or form.get("find_text_pdf_keyword") or "").strip(),
+        # Asset 404 input name flexibility
+        "asset_404_urls": (
+            form.get("asset_404_urls")
+            or form.get("asset_urls")
+            or form.get("asset_404")
+            or form.get("urls")
+            or ""
+        ).strip(),
+    }
+
+
+def _run_generator(key: str, inputs: dict[str, str]):
+    if key == "broken-link":
+        return broken_link.generate_broken_link_report()
+    if key == "header":
+        return header.generate_header_nav_report()
+    if key == "footer":
+        return footer.generate_footer_nav_report()
+    if key == "image":
+        return image_link.generate_image_link_report()
+    if key == "metadata":
+        return metadata_link.generate_metadata_report()
+    if key == "pdf":
+        return pdf_link.generate_pdf_link_report()
+    if key == "redirects":
+        return redirects.generate_redirect_report()
+    if key == "find-text-url":
+        return find_text.find_text_in_url(inputs["find_text_url"])
+    if key == "find-text-pdf":
+        return find_text_pdf.find_text_in_pdf(inputs["find_text_pdf"])
+    if key == "asset-404":
+        if not inputs["asset_404_urls"]:
+            return "No URLs provided for Asset 404 check.", []
+        return asset_404.generate_asset_404_report(inputs["asset_404_urls"])
+    if key == "page-weight":
+        return page_weight.generate_page_weight_report()
+    raise ValueError(f"Unknown report: {key}")
+
+
+def _report_inputs(key: str, inputs: dict[str, str], selected_reports: list[str]):
+    """The inputs a report's result depends on (part of its cache key)."""
+    if key == "find-text-url":
+        return inputs["find_text_url"]
+    if key == "find-text-pdf":
+        return inputs["find_text_pdf"]
+    if key == "asset-404":
+        return inputs["asset_404_urls"]
+    if key == "page-weight":
+        # Built from whichever asset reports ran alongside it
+        return sorted(k for k in selected_reports if k in ASSET_REPORTS)
+    return ""
+
+
+def request_key(selected_reports: list[str], form: dict[str, str]):
+    """
+    Key for a request's selected reports and inputs, without fetching
+    anything (so it is cheap enough for the web request thread), or None
+    when caching is off. Identical in-flight requests share a run on it.
+    """
+    if not report_cache.is_enabled():
+        return None
+    inputs = _form_inputs(form)
+    parts = [[k, _report_inputs(k, inputs, selected_reports)] for k in REPORTS if k in selected_reports]
+    parts.append(["time_budget", run_context.get_time_budget(form.get("time_budget"))])
+    parts.append(["sites", [[s.name, s.locales, s.sitemap_url] for s in sites.get_sites(form.get("sites", ""))]])
+    return report_cache.make_key("request", parts, None)
+
+
+def request_cache_key(selected_reports: list[str], form: dict[str, str]):
+    """
+    Cache key for a whole request (request_key plus the current sitemap
+    fingerprint of every site), or None when caching is off or a sitemap
+    cannot be fetched. Fetches the sitemaps, so call it from the run.
+    """
+    key = request_key(selected_reports, form)
+    if key is None:
+        return None
+    fingerprints = []
+    for site in sites.get_sites(form.get("sites", "")):
+        with sites.use(site):
+            fingerprint = report_cache.site_fingerprint()
+        if not fingerprint:
+            return None
+        fingerprints.append([site.name, site.locales, fingerprint])
+    return report_cache.make_key("request", key, fingerprints)
+
+
+def generate_reports(selected_reports: list[str], form: dict[str, str], use_cache: bool = True):
+    """
+    Run selected report generators and return structured output.
+
+    Each item:
+      (report_type, summary, details, headers)
+
+    details can be:
+      list[dict] OR list[list] OR list[str]
+
+    With use_cache (and REPORT_CACHE_TTL > 0), a report finished within the
+    TTL for the same inputs and unchanged sitemap is reused instead of re-run.
+    Reports cut short by the run's time budget are never cached.
+
+    With several sites (form "sites" or SITES_FILE, see sites.py) the sites
+    are crawled concurrently, MAX_PARALLEL_SITES at a time, each in a child
+    RunContext. Report types are then labelled "<site> | <report>", grouped
+    by site, and Asset 404 input URLs go to the site whose host they are on.
+    """
+    site_list = sites.get_sites(form.get("sites", ""))
+    if len(site_list) == 1:
+        with sites.use(site_list[0]):
+            return _generate_site_reports(selected_reports, form, use_cache)
+
+    parent = run_context.current()
+
+    def run_site(site):
+        ctx = parent.site_context(site.name, len(selected_reports))
+        with run_context.use(ctx), sites.use(site):
+            try:
+                report_data = _generate_site_reports(selected_reports, form, use_cache, site_list)
+            except BaseException:
+                ctx.finish("failed")
+                raise
+            ctx.finish("done")
+            return report_data
+
+    with ThreadPoolExecutor(max_workers=min(len(site_list), _max_parallel_sites())) as pool:
+        # Each thread needs its own copy of the caller's context variables
+        futures = [pool.submit(contextvars.copy_context().run, run_site, site) for site in site_list]
+        report_data = []
+        for future in futures:
+            report_data.extend(future.result())
+    return report_data
+
+
+def _skipped(key, inputs, site_list):
+    """True for a selected report with nothing to do, which is skipped silently."""
+    # Text searches need a keyword
+    if key == "find-text-url" and not inputs["find_text_url"]:
+        return True
+    if key == "find-text-pdf" and not inputs["find_text_pdf"]:
+        return True
+    # Sites none of the Asset 404 URLs belong to have nothing to check
+    return key == "asset-404" and bool(site_list) and not inputs["asset_404_urls"]
+
+
+def _generate_site_reports(selected_reports, form, use_cache=True, site_list=None):
+    """generate_reports() for the current site; site_list is set in multi-site runs."""
+    report_data = []
+    progress = run_context.current()
+    inputs = _form_inputs(form)
+    site = sites.current()
+    if site_list and inputs["asset_404_urls"]:
+        inputs["asset_404_urls"] = "\n".join(
+            u for u in asset_404.normalize_input_urls(inputs["asset_404_urls"])
+            if sites.owner(u, site_list) == site
+        )
+
+    fingerprint = ""
+    if use_cache and report_cache.is_enabled():
+        fingerprint = report_cache.site_fingerprint()
+
+    def cache_key(key):
+        if not fingerprint:
+            return None
+        return report_cache.make_key(key, _report_inputs(key, inputs, selected_reports), fingerprint)
+
+    # Page Weight reads this run's asset checks, so unless it is cached
+    # itself the asset reports must really run
+    weight_live = "page-weight" in selected_reports and (
+        not fingerprint or report_cache.get(cache_key("page-weight")) is None
+    )
+
+    planned = [key for key in REPORTS if key in selected_reports and not _skipped(key, inputs, site_list)]
+    # Only reports that crawl share the time budget
+    progress.plan_reports(len(planned), sum(1 for key in planned if key not in OFFLINE_REPORTS))
+
+    for key in planned:
+        report_type, headers = REPORTS[key]
+        if site_list:
+            report_type = sites.label(site, report_type)
+
+        progress.begin_report(report_type, crawls=key not in OFFLINE_REPORTS)
+
+        report_key = cache_key(key)
+        cached = None
+        if report_key and not (weight_live and key in ASSET_REPORTS):
+            cached = report_cache.get(report_key)
+
+        if cached is not None:
+            summary, details = cached
+        else:
+            summary, details = _run_generator(key, inputs)
+            if report_key and not progress.stopped_early:
+                report_cache.put(report_key, (f"(Cached result) {summary}", details))
+        report_data.append((report_type, summary, details, headers))
+
+    return report_data
+
+
+def order_report_data(report_data):
+    """
+    Sort generate_reports() items (e.g. merged from several workers) into run
+    order, grouped by site (in order of first appearance) for multi-site runs.
+    """
+    order = {report_type: i for i, (report_type, _) in enumerate(REPORTS.values())}
+    site_order = {}
+    for report_type, _, _, _ in report_data:
+        site_order.setdefault(sites.split_label(report_type)[0], len(site_order))
+
+    def sort_key(item):
+        site_name, report_type = sites.split_label(item[0])
+        return site_order[site_name], order.get(report_type, len(order))
+
+    return sorted(report_data, key=sort_key)
+
+
+def report_rows(details, headers):
+    """Flatten a report's details into lists in header order."""
+    rows = []
+    for row in details:
+        _safe_append_row(rows, row, headers=headers)
+    return rows
+
+
+def build_workbook(report_data, output=None):
+    """
+    Write generate_reports() output to the "Report Summary" sheet of a new XLSX.
+
+    output may be a file path or binary file object to save straight to disk;
+    by default an in-memory BytesIO is returned, rewound for sending.
+    """
+    wb = _workbook(report_data)
+    if output is not None:
+        wb.save(output)
+        return output
+
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def _workbook(report_data) -> Workbook:
+    wb = Workbook()
+    ws = cast(Worksheet, wb.active)
+    ws.title = "Report Summary"
+    ws.append(["Report Type", "Details"])
+
+    current_site = ""
+    for report_type, summary, details, headers in report_data:
+        # Multi-site runs: a heading row starts each site's section
+        site_name, _ = sites.split_label(report_type)
+        if site_name and site_name != current_site:
+            current_site = site_name
+            ws.append([f"Site: {site_name}", ""])
+        ws.append([report_type, summary])
+
+        if details:
+            ws.append(["", ""])  # spacer
+            ws.append(headers)
+
+            for row in details:
+                _safe_append_row(ws, row, headers=headers)
+
+            ws.append(["", ""])  # spacer
+
+    return wb
@@ -0,0 +1,167 @@
+# report_schema.py
+"""
+Row types for each report, with the column headers they are written under.
+
+Rows are NamedTuples: no per-row dict, and the field order IS the column
+order, so report_runner writes them to the sheet positionally. COLUMNS is
+the header list shown in the XLSX/CSV/JSON output and the result store.
+KEY names the columns that identify a finding across runs (result_store
+diffs); the other columns (status, timings, counts, error text) may change
+between runs without making it a different finding. URL is the KEY column
+holding the URL the finding is about (the broken link, image, asset...),
+which the result store indexes rows by.
+"""
+from typing import NamedTuple, Union
+
+Cell = Union[str, int]
+
+
+class BrokenLinkRow(NamedTuple):
+    page_url: str  # referring page(s), one per line, or "(sitemap)"
+    broken_link: str
+    error: Cell
+
+    COLUMNS = ("Page URL", "Broken Link", "Error")
+    KEY = ("Broken Link",)
+    URL = "Broken Link"
+
+
+class NavLinkRow(NamedTuple):
+    country: str
+    page_url: str
+    link_text: str
+    link_url: str
+    status_code: Cell
+    error: str
+
+    COLUMNS = ("Country", "Page URL", "Link Text", "Link URL", "Status Code", "Error")
+    KEY = ("Country", "Page URL", "Link URL")
+    URL = "Link URL"
+
+
+class BrokenImageRow(NamedTuple):
+    page_url: str
+    image_url: str
+    error: Cell
+
+    COLUMNS = ("Page URL", "Broken Image URL", "Error")
+    KEY = ("Page URL", "Broken Image URL")
+    URL = "Broken Image URL"
+
+
+class MetadataRow(NamedTuple):
+    url: str
+    title: str = ""
+    description: str = ""
+    keywords: str = ""
+    title_chars: Cell = ""
+    description_chars: Cell = ""
+    keywords_chars: Cell = ""
+    canonical: str = ""
+    robots: str = ""
+    hreflang: str = ""
+    og_title: str = ""
+    og_description: str = ""
+    og_image: str = ""
+    h1: str = ""
+    h1_count: Cell = ""
+    same_title: Cell = ""
+    same_description: Cell = ""
+    issues: str = ""
+    error_type: str = ""
+
+    COLUMNS = (
+        "URL", "Title Tag", "Meta Description", "Meta Keywords",
+        "Title Tag Character Count", "Meta Description Character Count", "Meta Keywords Character Count",
+        "Canonical", "Meta Robots", "Hreflang", "OG Title", "OG Description", "OG Image",
+        "H1", "H1 Count", "Pages With Same Title", "Pages With Same Description",
+        "Issues", "Error Type",
+    )
+    KEY = ("URL",)
+    URL = "URL"
+
+
+class BrokenPdfRow(NamedTuple):
+    page_url: str
+    pdf_url: str
+    error: Cell
+
+    COLUMNS = ("Page URL", "Broken PDF URL", "Error")
+    KEY = ("Page URL", "Broken PDF URL")
+    URL = "Broken PDF URL"
+
+
+class RedirectRow(NamedTuple):
+    page_url: str
+    start_url: str
+    redirects: int
+    chain: str
+    final_status: Cell
+    total_ms: int
+    issue: str
+
+    COLUMNS = ("Page URL", "Start URL", "Redirects", "Chain", "Final Status", "Total Time (ms)", "Issue")
+    KEY = ("Page URL", "Start URL")
+    URL = "Start URL"
+
+
+class PdfTextRow(NamedTuple):
+    pdf_file: str
+    found_text: str
+
+    COLUMNS = ("PDF File", "Found Text")
+    KEY = ("PDF File",)
+    URL = "PDF File"
+
+
+class Asset404Row(NamedTuple):
+    input_page: str
+    asset_type: str
+    asset_url: str
+    status_code: Cell
+    error: str
+
+    COLUMNS = ("Input Page", "Asset Type", "Asset URL", "Status Code", "Error")
+    KEY = ("Input Page", "Asset URL")
+    URL = "Asset URL"
+
+
+class PageWeightRow(NamedTuple):
+    page_url: str
+    images: int
+    image_bytes: int
+    pdfs: int
+    pdf_bytes: int
+    total_bytes: int
+    unknown_size: int
+    slowest_asset: str
+    slowest_ttfb_ms: Cell
+    uncompressed_assets: str
+    uncacheable_assets: str
+    oversized_images: str
+
+    COLUMNS = (
+        "Page URL", "Images", "Image Bytes", "PDFs", "PDF Bytes", "Total Bytes", "Unknown Size",
+        "Slowest Asset", "Slowest TTFB (ms)", "Uncompressed Assets", "Uncacheable Assets", "Oversized Images",
+    )
+    KEY = ("Page URL",)
+    URL = "Page URL"
+
+
+ROW_TYPES = (
+    BrokenLinkRow, NavLinkRow, BrokenImageRow, MetadataRow, BrokenPdfRow,
+    RedirectRow, PdfTextRow, Asset404Row, PageWeightRow,
+)
+_TYPES_BY_COLUMNS = {tuple(t.COLUMNS): t for t in ROW_TYPES}
+
+
+def key_columns(headers):
+    """KEY of the row type written under headers, or None for an unknown header list."""
+    row_type = _TYPES_BY_COLUMNS.get(tuple(headers))
+    return row_type.KEY if row_type else None
+
+
+def url_column(headers):
+    """URL column of the row type written under headers, or None for an unknown header list."""
+    row_type = _TYPES_BY_COLUMNS.get(tuple(headers))
+    return row_type.URL if row_type else None
@@ -0,0 +1,306 @@
+# result_store.py
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+import report_schema
+
+# Set RESULT_STORE_PATH="" to disable persistence entirely
+DEFAULT_STORE_PATH = "site_health_runs.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id     TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_reports (
+    run_id       TEXT NOT NULL,
+    report_type  TEXT NOT NULL,
+    summary      TEXT,
+    headers_json TEXT NOT NULL,
+    PRIMARY KEY (run_id, report_type)
+);
+CREATE TABLE IF NOT EXISTS report_rows (
+    run_id      TEXT NOT NULL,
+    report_type TEXT NOT NULL,
+    url         TEXT,
+    row_key     TEXT NOT NULL,
+    row_json    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rows_run ON report_rows (run_id, report_type);
+CREATE INDEX IF NOT EXISTS ix_rows_key ON report_rows (report_type, row_key);
+CREATE INDEX IF NOT EXISTS ix_rows_url ON report_rows (report_type, url);
+"""
+
+
+def store_path():
+    return os.getenv("RESULT_STORE_PATH", DEFAULT_STORE_PATH)
+
+
+def is_enabled():
+    return bool(store_path())
+
+
+def _connect():
+    conn = sqlite3.connect(store_path(), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _row_values(row, headers):
+    """Flatten a report row (dict/list/tuple/scalar) into header order."""
+    if isinstance(row, dict):
+        return [row.get(h, "") for h in headers]
+    if isinstance(row, (list, tuple)):
+        vals = list(row)[: len(headers)]
+        return vals + [""] * (len(headers) - len(vals))
+    return [row] + [""] * (len(headers) - 1)
+
+
+def _row_url(values, headers):
+    """The URL the row's finding is about (its report's URL column, see report_schema)."""
+    col = report_schema.url_column(headers)
+    if col in headers:
+        return str(values[headers.index(col)])
+    return str(values[0]) if values else ""
+
+
+def _row_key(values, headers):
+    """
+    Identity of a row across runs: a hash of its report's KEY columns (see
+    report_schema), so volatile columns such as latencies, counts or error
+    text don't make it a new finding. Unknown header lists use the whole row.
+    """
+    key_columns = report_schema.key_columns(headers)
+    if key_columns:
+        values = [values[headers.index(c)] if c in headers else "" for c in key_columns]
+    raw = json.dumps(values, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def new_run_id():
+    return datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+
+def save_run(report_data, run_id=None):
+    """
+    Persist every detail row of a run.
+
+    report_data is the output of report_runner.generate_reports:
+      (report_type, summary, details, headers)
+
+    Rows are stored per (run_id, report_type, url) with a row_key hashed from
+    the report's identifying columns, so the same finding can be matched
+    across runs even when its status, timings or error text change.
+    Returns the run id.
+    """
+    run_id = run_id or new_run_id()
+    created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    with closing(_connect()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO runs (run_id, created_at) VALUES (?, ?)", (run_id, created_at))
+
+        for report_type, summary, details, headers in report_data:
+            headers = list(headers)
+            conn.execute(
+                "INSERT OR REPLACE INTO run_reports (run_id, report_type, summary, headers_json) VALUES (?, ?, ?, ?)",
+                (run_id, report_type, str(summary), json.dumps(headers)),
+            )
+
+            batch = []
+            for row in details or []:
+                values = _row_values(row, headers)
+                raw = json.dumps(values, default=str, ensure_ascii=False)
+                batch.append((run_id, report_type, _row_url(values, headers), _row_key(values, headers), raw))
+            conn.executemany(
+                "INSERT INTO report_rows (run_id, report_type, url, row_key, row_json) VALUES (?, ?, ?, ?, ?)",
+                batch,
+            )
+
+    return run_id
+
+
+def list_runs(limit=50):
+    """Most recent runs first, each with the reports it contains."""
+    with closing(_connect()) as conn:
+        runs = conn.execute(
+            "SELECT run_id, created_at FROM runs ORDER BY created_at DESC, run_id DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+        out = []
+        for r in runs:
+            reports = conn.execute(
+                """
+                SELECT rr.report_type, rr.summary,
+                       (SELECT COUNT(*) FROM report_rows x
+                         WHERE x.run_id = rr.run_id AND x.report_type = rr.report_type) AS row_count
+                FROM run_reports rr WHERE rr.run_id = ?
+                ORDER BY rr.report_type
+                """,
+                (r["run_id"],),
+            ).fetchall()
+            out.append(
+                {
+                    "run_id": r["run_id"],
+                    "created_at": r["created_at"],
+                    "reports": [dict(x) for x in reports],
+                }
+            )
+        return out
+
+
+def previous_run_id(run_id, report_type):
+    """Latest run before run_id that contains report_type (None if there is none)."""
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            """
+            SELECT r.run_id FROM runs r
+            JOIN run_reports rr ON rr.run_id = r.run_id AND rr.report_type = ?
+            WHERE r.created_at < (SELECT created_at FROM runs WHERE run_id = ?)
+               OR (r.created_at = (SELECT created_at FROM runs WHERE run_id = ?) AND r.run_id < ?)
+            ORDER BY r.created_at DESC, r.run_id DESC LIMIT 1
+            """,
+            (report_type, run_id, run_id, run_id),
+        ).fetchone()
+        return row["run_id"] if row else None
+
+
+def previous_finding_urls(report_type):
+    """
+    Every URL appearing in a row of the latest stored run of report_type
+    (pages and links that were broken/flagged last time; multi-line cells
+    such as referring-page lists are split). Empty set if there is none.
+    """
+    if not is_enabled():
+        return set()
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            """
+            SELECT r.run_id FROM runs r
+            JOIN run_reports rr ON rr.run_id = r.run_id AND rr.report_type = ?
+            ORDER BY r.created_at DESC, r.run_id DESC LIMIT 1
+            """,
+            (report_type,),
+        ).fetchone()
+        if row is None:
+            return set()
+        rows = _load_rows(conn, row["run_id"], report_type)
+
+    urls = set()
+    for values in rows.values():
+        for value in values:
+            if isinstance(value, str):
+                urls.update(v.strip() for v in value.splitlines() if v.strip().startswith(("http://", "https://")))
+    return urls
+
+
+def _load_rows(conn, run_id, report_type, headers=None):
+    """
+    {row key: values} for one report of a run. Keys are recomputed from the
+    values with headers (default: the report's own), so rows stored before
+    KEY columns existed still match current ones.
+    """
+    if headers is None:
+        headers = _load_headers(conn, run_id, report_type)
+    rows = conn.execute(
+        "SELECT row_json FROM report_rows WHERE run_id = ? AND report_type = ?",
+        (run_id, report_type),
+    ).fetchall()
+    out = {}
+    for r in rows:
+        values = json.loads(r["row_json"])
+        out[_row_key(values, headers)] = values
+    return out
+
+
+def _load_headers(conn, run_id, report_type):
+    row = conn.execute(
+        "SELECT headers_json FROM run_reports WHERE run_id = ? AND report_type = ?",
+        (run_id, report_type),
+    ).fetchone()
+    return json.loads(row["headers_json"]) if row else []
+
+
+def diff_runs(head_run_id, base_run_id=None, report_type=None):
+    """
+    Compare two runs report by report.
+
+    - base_run_id=None compares each report against its previous run ("new since last run")
+    - report_type=None diffs every report contained in the head run
+
+    Returns list[dict] with keys:
+      report_type, base_run_id, headers, new (rows), resolved (rows), unchanged (count)
+    """
+    with closing(_connect()) as conn:
+        if report_type:
+            report_types = [report_type]
+        else:
+            report_types = [
+                r["report_type"]
+                for r in conn.execute(
+                    "SELECT report_type FROM run_reports WHERE run_id = ? ORDER BY report_type", (head_run_id,)
+                ).fetchall()
+            ]
+
+    diffs = []
+    for rt in report_types:
+        base = base_run_id or previous_run_id(head_run_id, rt)
+        with closing(_connect()) as conn:
+            head_rows = _load_rows(conn, head_run_id, rt)
+            base_rows = _load_rows(conn, base, rt) if base else {}
+            headers = _load_headers(conn, head_run_id, rt) or (_load_headers(conn, base, rt) if base else [])
+
+        diffs.append(
+            {
+                "report_type": rt,
+                "base_run_id": base,
+                "headers": headers,
+                "new": [v for k, v in head_rows.items() if k not in base_rows],
+                "resolved": [v for k, v in base_rows.items() if k not in head_rows],
+                "unchanged": sum(1 for k in head_rows if k in base_rows),
+            }
+        )
+    return diffs
+
+
+def persistent_rows(report_type, days):
+    """
+    Rows from the latest run of report_type that have been present in every
+    run of that report for at least `days` days (e.g. "images broken for 7 days").
+
+    Returns (headers, rows) where each row is its values plus a trailing
+    "First Seen" timestamp.
+    """
+    with closing(_connect()) as conn:
+        runs = conn.execute(
+            """
+            SELECT r.run_id, r.created_at FROM runs r
+            JOIN run_reports rr ON rr.run_id = r.run_id AND rr.report_type = ?
+            ORDER BY r.created_at DESC, r.run_id DESC
+            """,
+            (report_type,),
+        ).fetchall()
+        if not runs:
+            return [], []
+
+        latest = _load_rows(conn, runs[0]["run_id"], report_type)
+        headers = _load_headers(conn, runs[0]["run_id"], report_type)
+
+        # Walk back through runs; a row's streak ends at the first run missing it
+        first_seen = {k: runs[0]["created_at"] for k in latest}
+        alive = set(latest)
+        for r in runs[1:]:
+            if not alive:
+                break
+            alive &= set(_load_rows(conn, r["run_id"], report_type))
+            for k in alive:
+                first_seen[k] = r["created_at"]
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat(timespec="seconds")
+    rows = [latest[k] + [first_seen[k]] for k in latest if first_seen[k] <= cutoff]
+    return headers + ["First Seen"], rows
@@ -0,0 +1,326 @@
+# run_context.py
+import os
+import re
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import env_config
+import page_cache
+from http_client import get_session
+
+# Optional local XLSX copies of report results (SAVE_LOCAL_EXCEL=1) go here
+DEFAULT_LOCAL_EXCEL_DIR = "."
+
+
+class RunCancelled(Exception):
+    """Raised from a crawl loop when the client cancelled the run."""
+
+
+def get_time_budget(minutes=None):
+    """
+    Wall-clock budget for a whole run, in seconds (0 = unlimited).
+    A form/CLI value in minutes wins over RUN_TIME_BUDGET_SECONDS.
+    """
+    if minutes in (None, ""):
+        return max(env_config.get_float("RUN_TIME_BUDGET_SECONDS", 0.0), 0.0)
+    try:
+        return max(float(minutes) * 60, 0.0)
+    except ValueError:
+        return 0.0
+
+
+class RunContext:
+    """
+    State for one report run, shared by the generators it calls.
+
+    - progress counters updated from every crawl loop (read by the SSE endpoint)
+    - a cancel flag the loops check between requests
+    - an optional time budget: each report that crawls gets an even share of
+      what is left, and loops stop before the page that would overrun it
+    - for multi-site runs, one child context per site (see site_context)
+    - caches that are only valid for one run (URL status results, redirect
+      hops, parsed pages) and the run's HTTP sessions, so concurrent runs
+      share no mutable state
+    """
+
+    def __init__(self, run_id="", reports_total=0, time_budget=0):
+        self.run_id = run_id
+        self.created = time.time()
+        self.started = time.monotonic()
+        self.reports_total = reports_total
+        self.time_budget = time_budget
+        self.deadline = self.started + time_budget if time_budget else None
+
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._sessions = threading.local()
+        self._file_id = run_id or uuid.uuid4().hex[:12]
+
+        self.site = ""
+        self.children = []
+
+        self.status = "running"  # running | done | failed | cancelled
+        self.message = ""
+        self.report = ""
+        self.reports_done = 0
+        self.report_started = self.started
+        self.pages_total = 0
+        self.pages_done = 0
+        self.report_deadline = self.deadline
+        self.crawls_left = None  # reports still to share the budget (see plan_reports)
+        self.stopped_early = False
+        self.assets_checked = 0
+        self.errors = 0
+        self.listeners = 0
+
+        # canonical URL -> link_checker.LinkResult
+        self.status_cache = {}
+        # redirecting URL -> link_checker.Hop (status, latency, next URL)
+        self.redirect_map = {}
+        # page URL -> {asset URL: "Image" | "PDF"} as checked by the asset reports
+        self.page_assets = {}
+        # host -> link_checker.HostHealth (per-host circuit breaker)
+        self.host_health = {}
+        # asset URL -> asset_validation problem ("" = valid), when ASSET_VALIDATION=1
+        self.asset_validation = {}
+        # body hash -> page_cache.ParsedPage
+        self.parse_cache = page_cache.ParseCache()
+
+    # --- Resources owned by the run ---
+    def session(self):
+        """
+        This run's requests Session for the calling thread. Sessions are never
+        shared between threads or runs; they all use http_client's shared
+        connection pool, so this costs no extra connections.
+        """
+        s = getattr(self._sessions, "session", None)
+        if s is None:
+            s = self._sessions.session = get_session()
+        return s
+
+    def local_excel_path(self, filename):
+        """
+        Path for a report's optional local XLSX copy, or None unless
+        SAVE_LOCAL_EXCEL=1. Files go to LOCAL_EXCEL_DIR (default: the working
+        directory), prefixed with the run id and site so concurrent runs never
+        write the same file.
+        """
+        if os.getenv("SAVE_LOCAL_EXCEL", "0") != "1":
+            return None
+        prefix = "-".join(p for p in (self._file_id, self.site) if p)
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{prefix}-{filename}")
+        return os.path.join(os.getenv("LOCAL_EXCEL_DIR", DEFAULT_LOCAL_EXCEL_DIR), name)
+
+    # --- Called from the report loops ---
+    def plan_reports(self, total, crawling):
+        """
+        Reports that will actually run (after skips), and how many of them
+        crawl; only those share the time budget.
+        """
+        with self._lock:
+            self.reports_total = total
+            self.crawls_left = crawling
+
+    def begin_report(self, name, crawls=True):
+        """Start report `name`; crawls=False for reports that make no requests (no budget share)."""
+        with self._lock:
+            if self.report:
+                self.reports_done += 1
+            self.report = name
+            self.report_started = time.monotonic()
+            self.pages_total = 0
+            self.pages_done = 0
+            self.stopped_early = False
+            if self.deadline is not None and crawls:
+                # Even share of the remaining budget; time a report leaves
+                # unused rolls over to the ones after it
+                left = max(self.deadline - self.report_started, 0.0)
+                if self.crawls_left is None:
+                    shares = self.reports_total - self.reports_done
+                else:
+                    shares = self.crawls_left
+                    self.crawls_left -= 1
+                self.report_deadline = self.report_started + left / max(shares, 1)
+            else:
+                self.report_deadline = self.deadline
+        self.check_cancelled()
+
+    def add_pages(self, n):
+        with self._lock:
+            self.pages_total += n
+
+    def begin_page(self):
+        self.check_cancelled()
+        with self._lock:
+            self.pages_done += 1
+
+    def out_of_time(self):
+        """
+        True when the next page is not expected to finish before this report's
+        deadline, judged by the average time per page so far. Loops check it
+        before begin_page() and stop there, so rows already built stay intact.
+        """
+        if self.report_deadline is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            per_page = (now - self.report_started) / self.pages_done if self.pages_done else 0.0
+            if now + per_page < self.report_deadline:
+                return False
+            self.stopped_early = True
+            return True
+
+    def coverage_note(self):
+        """Summary sentence for a report cut short by the time budget ("" otherwise)."""
+        if not self.stopped_early:
+            return ""
+        return f"Stopped at the time budget after {self.pages_done} of {self.pages_total} pages (partial results)."
+
+    def asset_checked(self):
+        self.check_cancelled()
+        with self._lock:
+            self.assets_checked += 1
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_asset(self, page_url, asset_url, kind):
+        """Remember that page_url references asset_url (its check result is in status_cache)."""
+        with self._lock:
+            self.page_assets.setdefault(page_url, {})[asset_url] = kind
+
+    # --- Multi-site runs ---
+    def site_context(self, site_name, reports_total):
+        """
+        Child context for one site of a multi-site run. It has its own
+        progress counters, sessions and Page Weight asset data, and shares the
+        parent's cancel flag, deadline, URL/parse caches and per-host circuit
+        breaker.
+        The parent's snapshot() reports the children combined.
+        """
+        child = RunContext(self.run_id, reports_total)
+        child.site = site_name
+        child._cancel = self._cancel
+        if self.deadline is not None:
+            child.time_budget = self.time_budget
+            child.deadline = child.report_deadline = self.deadline
+        child.status_cache = self.status_cache
+        child.redirect_map = self.redirect_map
+        child.host_health = self.host_health
+        child.asset_validation = self.asset_validation
+        child.parse_cache = self.parse_cache
+        with self._lock:
+            self.children.append(child)
+        return child
+
+    # --- Progress listeners (SSE clients) ---
+    def attach(self):
+        with self._lock:
+            self.listeners += 1
+
+    def detach(self):
+        """Returns the number of listeners still attached."""
+        with self._lock:
+            self.listeners -= 1
+            return self.listeners
+
+    # --- Cancellation ---
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise RunCancelled("Run cancelled by client.")
+
+    # --- Lifecycle ---
+    def finish(self, status, message=""):
+        with self._lock:
+            if self.report:
+                self.reports_done += 1
+                self.report = ""
+            self.status = status
+            self.message = message
+
+    def snapshot(self):
+        """JSON-serializable progress, including an ETA for the current report."""
+        with self._lock:
+            children = list(self.children)
+        if children:
+            return self._combined_snapshot([(c.site, c.snapshot()) for c in children])
+
+        with self._lock:
+            now = time.monotonic()
+            eta = None
+            if self.status == "running" and self.pages_done and self.pages_total > self.pages_done:
+                rate = self.pages_done / max(now - self.report_started, 1e-6)
+                eta = round((self.pages_total - self.pages_done) / rate)
+            return {
+                "run_id": self.run_id,
+                "status": self.status,
+                "message": self.message,
+                "report": self.report,
+                "reports_done": self.reports_done,
+                "reports_total": self.reports_total,
+                "pages_done": self.pages_done,
+                "pages_total": self.pages_total,
+                "assets_checked": self.assets_checked,
+                "errors": self.errors,
+                "elapsed": round(now - self.started),
+                "eta": eta,
+                "time_left": round(max(self.deadline - now, 0)) if self.deadline is not None else None,
+            }
+
+    def _combined_snapshot(self, sites):
+        with self._lock:
+            snap = {
+                "run_id": self.run_id,
+                "status": self.status,
+                "message": self.message,
+                "elapsed": round(time.monotonic() - self.started),
+            }
+        running = [(name, s) for name, s in sites if s["status"] == "running" and s["report"]]
+        etas = [s["eta"] for _, s in running if s["eta"] is not None]
+        snap.update(
+            report="; ".join(s["report"] for _, s in running),
+            reports_done=sum(s["reports_done"] for _, s in sites),
+            reports_total=sum(s["reports_total"] for _, s in sites),
+            pages_done=sum(s["pages_done"] for _, s in sites),
+            pages_total=sum(s["pages_total"] for _, s in sites),
+            assets_checked=sum(s["assets_checked"] for _, s in sites),
+            errors=sum(s["errors"] for _, s in sites),
+            eta=max(etas) if etas else None,
+            time_left=round(max(self.deadline - time.monotonic(), 0)) if self.deadline is not None else None,
+            sites=len(sites),
+        )
+        return snap
+
+
+_current = contextvars.ContextVar("run_context")
+
+
+def current():
+    """
+    RunContext of the active run. Outside use() this is a fresh throwaway
+    context on every call: it is not stored, so nothing outlives the caller
+    on threads that never start a run.
+    """
+    ctx = _current.get(None)
+    return ctx if ctx is not None else RunContext()
+
+
+@contextmanager
+def use(ctx):
+    """Make ctx the current run for the code inside the with-block."""
+    token = _current.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
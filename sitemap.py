@@ -0,0 +1,250 @@
+# sitemap.py
+import os
+import math
+import random
+import certifi
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+import env_config
+import result_store
+import run_context
+import sites
+from http_client import iter_body, split_timeout
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+SAMPLE_MODES = ("first", "random", "stratified", "priority")
+
+# Mode used automatically when the run has a time budget
+BUDGET_MODE = "budget"
+
+# Recency weight halves every N days since <lastmod> (priority mode)
+RECENCY_HALF_LIFE_DAYS = 90
+
+
+class SitemapEntry(NamedTuple):
+    loc: str
+    lastmod: str = ""
+    priority: float = 0.5
+
+
+class SampleInfo(NamedTuple):
+    mode: str
+    population: int
+    size: int
+    seed: str
+
+
+def get_sitemap_url():
+    """Sitemap of the site being crawled (SITEMAP_URL unless a multi-site run says otherwise)."""
+    return sites.current().sitemap_url
+
+
+def get_max_pages(default=250):
+    """MAX_SITEMAP_PAGES env var (0 = scan all)."""
+    return env_config.get_int("MAX_SITEMAP_PAGES", default)
+
+
+def fetch_sitemap_entries(session, sitemap_url, headers, timeout=30):
+    """
+    Fetch a sitemap and return list[SitemapEntry] in document order.
+    Raises on network/parse errors so each report can phrase its own message.
+
+    The XML is parsed incrementally as it downloads and each <url> element is
+    freed once read, so large sitemaps are never held whole in memory.
+    """
+    entries = []
+    parser = ET.XMLPullParser(events=("end",))
+    with session.get(sitemap_url, headers=headers, verify=certifi.where(), timeout=split_timeout(timeout), stream=True) as resp:
+        resp.raise_for_status()
+        for chunk in iter_body(resp):
+            parser.feed(chunk)
+            entries.extend(_read_entries(parser))
+    parser.close()
+    entries.extend(_read_entries(parser))
+    return entries
+
+
+def _read_entries(parser):
+    """Yield a SitemapEntry for each <url> the parser has finished, then free it."""
+    for _, url_node in parser.read_events():
+        if url_node.tag != f"{SITEMAP_NS}url":
+            continue
+        loc_tag = url_node.find(f"{SITEMAP_NS}loc")
+        if loc_tag is None or not loc_tag.text:
+            url_node.clear()
+            continue
+
+        lastmod_tag = url_node.find(f"{SITEMAP_NS}lastmod")
+        priority_tag = url_node.find(f"{SITEMAP_NS}priority")
+        try:
+            priority = float(priority_tag.text) if priority_tag is not None and priority_tag.text else 0.5
+        except ValueError:
+            priority = 0.5
+
+        entry = SitemapEntry(
+            loc=loc_tag.text.strip(),
+            lastmod=(lastmod_tag.text or "").strip() if lastmod_tag is not None else "",
+            priority=priority,
+        )
+        url_node.clear()
+        yield entry
+
+
+def _section(url):
+    """Stratum key: first path segment ("/products/x" -> "products")."""
+    path = urlparse(url).path.strip("/")
+    return path.split("/", 1)[0].lower() if path else ""
+
+
+def _age_days(lastmod, now):
+    if not lastmod:
+        return None
+    try:
+        dt = datetime.fromisoformat(lastmod.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max((now - dt).total_seconds() / 86400, 0.0)
+
+
+def entry_weight(entry, now=None):
+    """Sitemap <priority> scaled by recency of <lastmod> (unknown lastmod counts as old)."""
+    age = _age_days(entry.lastmod, now or datetime.now(timezone.utc))
+    recency = 0.5 ** (age / RECENCY_HALF_LIFE_DAYS) if age is not None else 0.0
+    return max(entry.priority, 0.01) * (0.5 + recency)
+
+
+def _stratified(entries, k, rng):
+    strata = {}
+    for e in entries:
+        strata.setdefault(_section(e.loc), []).append(e)
+
+    # Proportional allocation, largest remainder
+    quotas = {key: k * len(group) / len(entries) for key, group in strata.items()}
+    alloc = {key: int(q) for key, q in quotas.items()}
+    leftover = k - sum(alloc.values())
+    for key in sorted(quotas, key=lambda x: quotas[x] - alloc[x], reverse=True)[:leftover]:
+        alloc[key] += 1
+
+    picked = []
+    for key, group in strata.items():
+        picked += rng.sample(group, alloc[key])
+    rng.shuffle(picked)
+    return picked
+
+
+def _weighted(entries, k, rng):
+    # Efraimidis-Spirakis weighted sampling without replacement; result is ordered by weight
+    now = datetime.now(timezone.utc)
+    keyed = [(rng.random() ** (1.0 / entry_weight(e, now)), e) for e in entries]
+    keyed.sort(key=lambda x: x[0], reverse=True)
+    return [e for _, e in keyed[:k]]
+
+
+def select_urls(entries, max_pages):
+    """
+    Pick which sitemap URLs a report crawls.
+
+    SAMPLE_MODE:
+    - first (default): the first MAX_SITEMAP_PAGES URLs in sitemap order
+    - random: uniform random sample
+    - stratified: random sample proportional to each path section
+    - priority: weighted by <priority> and <lastmod> recency, highest first
+
+    SAMPLE_SEED makes random/stratified/priority samples reproducible.
+
+    When the run has a time budget, the whole sitemap is queued (unless
+    MAX_SITEMAP_PAGES is set explicitly) in "budget" order instead: pages the
+    previous run of this report flagged first, then by <priority> and
+    <lastmod> recency. The report loop stops when time runs out, so the most
+    valuable pages are the ones covered.
+    Returns (urls, SampleInfo).
+    """
+    ctx = run_context.current()
+    if ctx.deadline is not None:
+        return _budget_order(entries, max_pages, ctx.report)
+
+    mode = os.getenv("SAMPLE_MODE", "first").strip().lower()
+    if mode not in SAMPLE_MODES:
+        mode = "first"
+    seed = os.getenv("SAMPLE_SEED", "")
+
+    population = len(entries)
+    k = population if max_pages <= 0 else min(max_pages, population)
+    rng = random.Random(seed) if seed else random.Random()
+
+    if mode == "random":
+        picked = rng.sample(entries, k)
+    elif mode == "stratified":
+        picked = _stratified(entries, k, rng) if k else []
+    elif mode == "priority":
+        picked = _weighted(entries, k, rng)
+    else:
+        picked = entries[:k]
+
+    return [e.loc for e in picked], SampleInfo(mode, population, k, seed)
+
+
+def _budget_order(entries, max_pages, report_type):
+    if "MAX_SITEMAP_PAGES" not in os.environ:
+        max_pages = 0
+    try:
+        flagged = result_store.previous_finding_urls(report_type) if report_type else set()
+    except Exception:
+        flagged = set()
+
+    now = datetime.now(timezone.utc)
+    ordered = sorted(entries, key=lambda e: (e.loc not in flagged, -entry_weight(e, now)))
+    k = len(ordered) if max_pages <= 0 else min(max_pages, len(ordered))
+    return [e.loc for e in ordered[:k]], SampleInfo(BUDGET_MODE, len(entries), k, "")
+
+
+def wilson_interval(hits, n, population=None, z=1.96):
+    """
+    95% Wilson score interval for a proportion, with finite population
+    correction when the sample covers a known population.
+    """
+    if n <= 0:
+        return 0.0, 0.0, 1.0
+    p = hits / n
+    if population and population > 1:
+        z *= math.sqrt(max(population - n, 0) / (population - 1))
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return p, max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def estimate_summary(info, hits, checked, label):
+    """
+    Site-wide estimate for a per-page rate, e.g. label="have broken images".
+    Only uniform samples (random/stratified, or a full scan) support an estimate.
+    """
+    if checked <= 0:
+        return ""
+    if info.mode == BUDGET_MODE:
+        stopped = " (stopped at the time budget)" if run_context.current().stopped_early else ""
+        return (
+            f"Covered {checked} of {info.population} sitemap URLs ({checked / max(info.population, 1):.0%}) "
+            f"within the time budget{stopped}; previously flagged, high-priority and recently modified "
+            f"pages first (not a sample; no site-wide estimate)."
+        )
+    if info.mode == "first" and info.size < info.population:
+        return f"Scanned the first {info.size} of {info.population} sitemap URLs (not a sample; no site-wide estimate)."
+    if info.mode == "priority" and info.size < info.population:
+        return f"Priority-weighted sample of {info.size} of {info.population} URLs (biased by design; no site-wide estimate)."
+
+    p, low, high = wilson_interval(hits, checked, info.population)
+    if info.size >= info.population:
+        basis = f"full scan, {checked} pages reached"
+    else:
+        basis = f"{info.mode} sample of {checked}" + (f", seed {info.seed}" if info.seed else "")
+    return (
+        f"Estimated site-wide: {p:.1%} of {info.population} pages {label} "
+        f"(95% CI {low:.1%}–{high:.1%}; {basis})."
+    )
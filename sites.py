@@ -0,0 +1,137 @@
+# sites.py
+"""
+Sites a run covers: each has a sitemap and the locale homepages whose
+header/footer navigation is checked.
+
+Sites come from (first match wins):
+- the form's "sites" field / cli.py --sites: one per line, "URL" or
+  "Name | URL", where URL is a sitemap or a site root (/sitemap.xml is added)
+- the JSON file named by SITES_FILE:
+    {"sites": [{"name": "Micron",
+                "sitemap": "https://www.micron.com/sitemap.xml",
+                "locales": [["EN", "https://www.micron.com/"], ["JP", "https://jp.micron.com/"]]}]}
+- SITEMAP_URL (default micron.com) as a single site
+
+Sites listed in the form that also appear in SITES_FILE (same sitemap)
+take their name and locales from the file. Without configured locales a
+site's only locale is its root URL, labelled "EN".
+"""
+import os
+import json
+import contextvars
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+DEFAULT_SITEMAP_URL = "https://www.micron.com/sitemap.xml"
+
+# Separates the site name from the report type in multi-site output
+LABEL_SEPARATOR = " | "
+
+
+class Site(NamedTuple):
+    name: str
+    sitemap_url: str
+    locales: tuple = ()  # ((label, homepage URL), ...)
+
+    @property
+    def host(self):
+        return _bare_host(self.sitemap_url)
+
+
+def _bare_host(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _root(url):
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def _make_site(name, url, locales=()):
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+    parts = urlparse(url)
+    sitemap_url = url if parts.path not in ("", "/") else _root(url) + "sitemap.xml"
+    locales = tuple((str(label), str(href)) for label, href in locales) or (("EN", _root(sitemap_url)),)
+    return Site(name or _bare_host(sitemap_url), sitemap_url, locales)
+
+
+@lru_cache(maxsize=None)
+def _configured_sites():
+    path = os.getenv("SITES_FILE", "")
+    if not path:
+        return ()
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return tuple(
+        _make_site(s.get("name", ""), s["sitemap"], s.get("locales", ()))
+        for s in config.get("sites", [])
+    )
+
+
+def default_site():
+    """The single site used when nothing else is configured (SITEMAP_URL)."""
+    return _make_site("", os.getenv("SITEMAP_URL", DEFAULT_SITEMAP_URL))
+
+
+def parse_sites(text):
+    """Sites from "URL" / "Name | URL" lines; configured name/locales are reused by sitemap URL."""
+    configured = {s.sitemap_url: s for s in _configured_sites()}
+    found = []
+    for line in (text or "").replace(",", "\n").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        name, _, url = line.rpartition("|")
+        site = _make_site(name.strip(), url.strip())
+        known = configured.get(site.sitemap_url)
+        if known is not None:
+            site = known._replace(name=name.strip() or known.name)
+        if site.sitemap_url not in {s.sitemap_url for s in found}:
+            found.append(site)
+    return found
+
+
+def get_sites(form_value=""):
+    """Sites for a run: the form/CLI list, else SITES_FILE, else the default site."""
+    return parse_sites(form_value) or list(_configured_sites()) or [default_site()]
+
+
+def owner(url, site_list):
+    """The site in site_list serving url (matched by host and port, www. ignored); the first site if none does."""
+    host = _bare_host(url)
+    for site in site_list:
+        if site.host == host or host.endswith("." + site.host):
+            return site
+    return site_list[0]
+
+
+def label(site, report_type):
+    return f"{site.name}{LABEL_SEPARATOR}{report_type}"
+
+
+def split_label(report_type):
+    """(site name, report type) for a labelled report type; ("", report_type) if unlabelled."""
+    name, sep, base = report_type.rpartition(LABEL_SEPARATOR)
+    return (name, base) if sep else ("", report_type)
+
+
+_current = contextvars.ContextVar("site")
+
+
+def current():
+    """Site the running report is crawling (the default site outside a multi-site run)."""
+    site = _current.get(None)
+    return site if site is not None else get_sites()[0]
+
+
+@contextmanager
+def use(site):
+    token = _current.set(site)
+    try:
+        yield site
+    finally:
+        _current.reset(token)
@@ -0,0 +1,95 @@
+# url_canon.py
+import os
+import fnmatch
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit, urlunsplit, unquote_plus
+
+# Tracking parameters dropped from query strings (globs allowed)
+# Override with CANON_STRIP_PARAMS="utm_*,gclid,sessionid" (empty string keeps every param)
+DEFAULT_STRIP_PARAMS = (
+    "utm_*", "gclid", "dclid", "fbclid", "msclkid", "yclid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi",
+)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+@lru_cache(maxsize=1)
+def _strip_matchers(raw):
+    patterns = [p.strip().lower() for p in raw.split(",") if p.strip()]
+    exact = frozenset(p for p in patterns if not any(c in p for c in "*?["))
+    globs = tuple(p for p in patterns if p not in exact)
+    return exact, globs
+
+
+def _is_stripped(name):
+    exact, globs = _strip_matchers(os.getenv("CANON_STRIP_PARAMS", ",".join(DEFAULT_STRIP_PARAMS)))
+    name = name.lower()
+    return name in exact or any(fnmatch.fnmatchcase(name, g) for g in globs)
+
+
+def _remove_dot_segments(path):
+    out = []
+    for seg in path.split("/"):
+        if seg == "..":
+            if len(out) > 1:
+                out.pop()
+        elif seg != ".":
+            out.append(seg)
+    if path.endswith(("/.", "/..")):
+        out.append("")
+    return "/".join(out)
+
+
+def resolve(url, base=None):
+    """url resolved against base (if given): the URL to request, exactly as the page links it."""
+    url = (url or "").strip()
+    return urljoin(base, url) if base else url
+
+
+def canonicalize(url, base=None):
+    """
+    Resolve url against base (if given) and normalize it so equivalent URLs
+    compare equal. This is a dedup / status-cache key only: request the
+    resolve()d URL, since servers may treat the canonical form differently.
+
+    - relative, "./x", "../x" and protocol-relative "//host/x" forms resolved
+    - scheme and host lowercased, default ports (:80/:443) dropped
+    - fragment removed, tracking query params stripped, remaining params sorted
+    - trailing slash removed from non-root paths only with CANON_TRAILING_SLASH=strip
+
+    Non-HTTP URLs (mailto:, javascript:, data:...) are returned resolved but otherwise untouched.
+    """
+    url = resolve(url, base)
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url
+
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+
+    path = _remove_dot_segments(parts.path) or "/"
+    if len(path) > 1 and path.endswith("/") and os.getenv("CANON_TRAILING_SLASH", "keep") == "strip":
+        path = path.rstrip("/") or "/"
+
+    # Params are kept as written (no re-encoding), only filtered and sorted
+    params = [
+        p for p in parts.query.split("&")
+        if p and not _is_stripped(unquote_plus(p.split("=", 1)[0]))
+    ]
+    query = "&".join(sorted(params))
+
+    return urlunsplit((scheme, host, path, query, ""))
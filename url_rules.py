@@ -0,0 +1,155 @@
+# url_rules.py
+"""
+Declarative URL include/exclude rules, compiled once per report.
+
+Rules are grouped by report (the form value, e.g. "image", "pdf", "asset-404",
+or "*" for every report) and by scope:
+
+- "pages": URLs a report fetches as pages (sitemap URLs, input URLs)
+- "links": URLs extracted from pages and then checked (links, images, PDFs)
+
+Each scope has optional "include" and "exclude" lists. A URL is allowed when it
+matches no exclude rule and, at each level that has include rules ("*" and
+the report's own), at least one of them. Levels are ANDed, so a "*" host
+include narrows the PDF report's ".pdf" include instead of widening it.
+
+Rule kinds (one key per rule; values may be a string or a list of strings):
+  {"glob": "*part-detail*"}            shell-style match on the full URL
+  {"regex": "\\.pdf(?:$|[?#])"}        regex search on the full URL
+  {"host": "cdn.example.com"}          exact host, or "*.example.com" for subdomains
+  {"path_prefix": "/products/"}        URL path starts with the prefix
+  {"scheme": ["mailto", "tel"]}        URL scheme
+
+Globs and regexes are case-insensitive. Custom rules are read from the JSON
+file named by URL_RULES_FILE and appended to the defaults below (set
+"replace_defaults": true in the file to drop the defaults).
+"""
+import os
+import re
+import json
+import fnmatch
+from functools import lru_cache
+from urllib.parse import urlparse
+
+DEFAULT_RULES = {
+    "*": {
+        # Not fetchable over HTTP
+        "links": {"exclude": [{"scheme": ["javascript", "mailto", "tel", "data"]}]},
+    },
+    "image": {
+        "pages": {"exclude": [{"glob": "*part-detail*"}]},
+    },
+    "pdf": {
+        # Also catches ".pdf?download=1" style links
+        "links": {"include": [{"regex": r"\.pdf(?:$|[?#])"}]},
+    },
+    "find-text-pdf": {
+        "links": {"include": [{"regex": r"\.pdf(?:$|[?#])"}]},
+    },
+}
+
+RULE_KINDS = ("glob", "regex", "host", "path_prefix", "scheme")
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+class UrlMatcher:
+    """A set of rules compiled into one regex plus set/prefix lookups."""
+
+    def __init__(self, rules):
+        patterns = []
+        hosts = set()
+        host_suffixes = []
+        path_prefixes = []
+        schemes = set()
+
+        for rule in rules:
+            unknown = set(rule) - set(RULE_KINDS)
+            if unknown:
+                raise ValueError(f"Unknown URL rule kind(s): {', '.join(sorted(unknown))}")
+
+            patterns += [fnmatch.translate(g) for g in _as_list(rule.get("glob"))]
+            patterns += _as_list(rule.get("regex"))
+            for h in _as_list(rule.get("host")):
+                h = h.lower()
+                if h.startswith("*."):
+                    host_suffixes.append(h[1:])
+                else:
+                    hosts.add(h)
+            path_prefixes += _as_list(rule.get("path_prefix"))
+            schemes |= {s.lower().rstrip(":") for s in _as_list(rule.get("scheme"))}
+
+        self._regex = re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE) if patterns else None
+        self._hosts = frozenset(hosts)
+        self._host_suffixes = tuple(host_suffixes)
+        self._path_prefixes = tuple(path_prefixes)
+        self._schemes = frozenset(schemes)
+        self._needs_parse = bool(hosts or host_suffixes or path_prefixes or schemes)
+        self.empty = not (self._regex or self._needs_parse)
+
+    def matches(self, url):
+        if self._regex is not None and self._regex.search(url):
+            return True
+        if not self._needs_parse:
+            return False
+
+        parts = urlparse(url)
+        if self._schemes and parts.scheme.lower() in self._schemes:
+            return True
+        host = (parts.hostname or "").lower()
+        if host in self._hosts or (self._host_suffixes and host.endswith(self._host_suffixes)):
+            return True
+        if self._path_prefixes and parts.path.startswith(self._path_prefixes):
+            return True
+        return False
+
+
+class UrlRules:
+    """Compiled include/exclude rules for one (report, scope)."""
+
+    def __init__(self, includes, exclude):
+        # One matcher per level; a URL must match every non-empty one
+        self.includes = tuple(m for m in (UrlMatcher(rules) for rules in includes) if not m.empty)
+        self.exclude = UrlMatcher(exclude)
+
+    def allows(self, url):
+        if not all(m.matches(url) for m in self.includes):
+            return False
+        return self.exclude.empty or not self.exclude.matches(url)
+
+    def filter(self, urls):
+        return [u for u in urls if self.allows(u)]
+
+
+def _load_config():
+    path = os.getenv("URL_RULES_FILE", "")
+    if not path:
+        return DEFAULT_RULES, {}
+
+    with open(path, encoding="utf-8") as f:
+        custom = json.load(f)
+    if custom.pop("replace_defaults", False):
+        return {}, custom
+    return DEFAULT_RULES, custom
+
+
+@lru_cache(maxsize=None)
+def get_rules(report, scope):
+    """
+    Compiled rules for a report key ("image", "pdf", ...) and scope ("pages" or "links").
+    Compiled once per process; "*" rules apply to every report.
+    """
+    includes = {"*": [], report: []}
+    exclude = []
+    for config in _load_config():
+        for key in includes:
+            section = config.get(key, {}).get(scope, {})
+            includes[key] += section.get("include", [])
+            exclude += section.get("exclude", [])
+    return UrlRules(includes.values(), exclude)
@@ -0,0 +1,125 @@
+# visible_text.py
+import codecs
+from html.parser import HTMLParser
+
+from http_client import CHUNK_SIZE, iter_body
+
+# Elements whose contents are never rendered as page text
+SKIP_TAGS = frozenset({"script", "style", "noscript", "template"})
+
+
+def normalize(text):
+    """Lowercase and collapse runs of whitespace to single spaces."""
+    return " ".join(text.lower().split())
+
+
+class VisibleTextScanner(HTMLParser):
+    """
+    Incremental HTML parser that looks for a keyword in the visible text.
+
+    Text nodes are lowercased and whitespace-collapsed as they arrive and
+    joined with single spaces (like BeautifulSoup's get_text(" ", strip=True)),
+    but <script>/<style>/<noscript>/<template> contents are skipped. Only the
+    last len(keyword) - 1 characters are kept between nodes, so memory stays
+    flat however long the page is, and matches spanning nodes or feed chunks
+    are still found. Once the keyword is seen, further data is ignored.
+    """
+
+    def __init__(self, keyword):
+        super().__init__(convert_charrefs=True)
+        self.keyword = normalize(keyword)
+        self.found = not self.keyword
+        self._skip_depth = 0
+        self._tail = ""
+        # Pieces of the current text node (the parser may split it at feed boundaries)
+        self._pending = []
+        self._pending_len = 0
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_data(self, data):
+        if self.found or self._skip_depth:
+            return
+        self._pending.append(data)
+        self._pending_len += len(data)
+        if self._pending_len > CHUNK_SIZE:
+            self._flush(partial=True)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self, partial=False):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_len = 0
+        if partial:
+            # Keep the last (possibly unfinished) word for the next piece
+            cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"))
+            if cut > 0:
+                self._pending = [text[cut:]]
+                self._pending_len = len(text) - cut
+                text = text[:cut]
+            else:
+                self._pending = [text]
+                self._pending_len = len(text)
+                return
+        self._scan(normalize(text))
+
+    def _scan(self, text):
+        if self.found or not text:
+            return
+        window = f"{self._tail} {text}" if self._tail else text
+        if self.keyword in window:
+            self.found = True
+            return
+        keep = len(self.keyword) - 1
+        self._tail = window[-keep:] if keep else ""
+
+
+def contains_in_chunks(chunks, keyword):
+    """True if keyword occurs in the visible text of the HTML str chunks; stops reading at the first match."""
+    scanner = VisibleTextScanner(keyword)
+    for chunk in chunks:
+        if scanner.found:
+            break
+        scanner.feed(chunk)
+    if not scanner.found:
+        scanner.close()
+    return scanner.found
+
+
+def _decoded_chunks(resp, chunk_size):
+    try:
+        decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for raw in iter_body(resp, chunk_size):
+        yield decoder.decode(raw)
+    yield decoder.decode(b"", final=True)
+
+
+def response_contains(resp, keyword, chunk_size=CHUNK_SIZE):
+    """
+    Search a streamed requests Response (stream=True) for keyword in its visible
+    text. The body is decoded and parsed chunk by chunk and the rest of the
+    download is abandoned as soon as the keyword is found. Raises
+    http_client.BodyTooLarge if the page passes its size cap first.
+    """
+    try:
+        return contains_in_chunks(_decoded_chunks(resp, chunk_size), keyword)
+    finally:
+        resp.close()